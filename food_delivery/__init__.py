@@ -1,43 +1,271 @@
-import csv
-import sys
+import importlib
+import os
+import threading
 
-from flask import Flask
-from flask_admin import Admin
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
 from flask_login import LoginManager
-from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
+from werkzeug.middleware.proxy_fix import ProxyFix
 
-from food_delivery.admin import init_admin
+from food_delivery.api import api
+from food_delivery.cart import init_cart
 from food_delivery.config import Config
+from food_delivery.delivery import delivery_map, init_delivery
+from food_delivery.filters import init_filters
+from food_delivery.images import init_images
+from food_delivery.metrics import init_metrics
 from food_delivery.models import db
+from food_delivery.passwords import init_passwords
+from food_delivery.principals import init_principals, principal_cache
+from food_delivery.ratelimit import init_rate_limits
+from food_delivery.pool_stats import init_pool_stats
+from food_delivery.profiling import init_query_budget
+from food_delivery.views import main
 
+csrf = CSRFProtect()
 
-app = Flask(__name__)
-
-app.config.from_object(Config)
-db.init_app(app)
-migrate = Migrate(app, db)
-csrf = CSRFProtect(app)
-
-admin_manager = Admin()
-admin_manager.init_app(app)
-init_admin(admin_manager)
-
-from food_delivery.views import *
-from food_delivery import filters
-
-login_manager = LoginManager(app)
-login_manager.login_view = "login_view"
+login_manager = LoginManager()
+login_manager.login_view = "main.login_view"
 login_manager.login_message_category = "warning"
 login_manager.login_message = "Авторизуйтесь для доступа к странице"
 
 
 @login_manager.user_loader
 def load_user(uid):
-    return User.query.get(uid)
+    return principal_cache.get(int(uid))
+
+
+class LazyAdmin:
+    """ WSGI wrapper that registers Flask-Admin before the first request is routed. """
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self.loaded:
+            return
+        with self._lock:
+            if not self.loaded:
+                from food_delivery.admin import init_admin
+
+                init_admin(self.app)
+                self.loaded = True
+
+    def __call__(self, environ, start_response):
+        self.load()
+        return self.wsgi_app(environ, start_response)
+
+
+class LazyGroup(click.Group):
+    """ Command group whose module is only imported when one of its commands runs. """
+
+    def __init__(self, name, import_name, **kwargs):
+        super().__init__(name, **kwargs)
+        self.import_name = import_name
+
+    def _group(self):
+        module, _, attribute = self.import_name.partition(":")
+        return getattr(importlib.import_module(module), attribute)
+
+    def list_commands(self, ctx):
+        return self._group().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._group().get_command(ctx, name)
+
+
+def create_app(config=Config):
+    """ Build the app; Flask-Admin is only imported once it serves a request. """
+    app = Flask(__name__)
+    app.config.from_object(config)
+    db.init_app(app)
+    init_query_budget(app)
+    init_pool_stats(db.get_engine(app))
+    init_metrics(app)
+    init_cart(app)
+    init_images(app)
+    init_passwords(app)
+    init_principals(app)
+    init_delivery(app)
+    init_rate_limits(app)
+    init_filters(app)
+    csrf.init_app(app)
+    login_manager.init_app(app)
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+
+    # The flask command has imported Flask-Migrate for its db group already.
+    if os.environ.get("FLASK_RUN_FROM_CLI"):
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
+
+    for command in COMMANDS:
+        app.cli.add_command(command)
+
+    # Behind a router remote_addr is the router's; rate limits need the client's.
+    hops = app.config["TRUSTED_PROXY_HOPS"]
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    app.wsgi_app = app.extensions["lazy_admin"] = LazyAdmin(app)
+    return app
+
+
+def preload(app):
+    """ Do the lazy setup now, so that workers forked from this process share it. """
+    from datetime import datetime
+
+    app.extensions["lazy_admin"].load()
+    delivery_map(app)
+    app.jinja_env.filters["date_format_ru"](datetime.utcnow())
+    for name in app.jinja_loader.list_templates():
+        app.jinja_env.get_template(name)
+
+
+@click.command("seed")
+@click.option("--chunk-size", default=1000, show_default=True)
+@click.option("--dry-run", is_flag=True, help="Parse and match rows without writing.")
+@click.option("--categories", "categories_csv", help="Categories CSV file.")
+@click.option("--dishes", "dishes_csv", help="Dishes CSV file.")
+@with_appcontext
+def seed(chunk_size, dry_run, categories_csv, dishes_csv):
+    from food_delivery import seeder
+
+    seeder.seed(
+        chunk_size,
+        dry_run,
+        categories_csv or seeder.CATEGORIES_CSV,
+        dishes_csv or seeder.DISHES_CSV,
+    )
+
+
+@click.command("check-query-plans")
+@with_appcontext
+def check_query_plans():
+    from food_delivery.query_plans import check_query_plans
+
+    check_query_plans()
+
+
+@click.command("build-images")
+@click.option("--workers", type=int, help="Worker processes (default: CPU count).")
+@click.option("--force", is_flag=True, help="Rebuild unchanged pictures too.")
+@with_appcontext
+def build_images(workers, force):
+    from food_delivery.images import build_images
+    from food_delivery.models import Dish
+
+    pictures = [picture for picture, in db.session.query(Dish.picture).distinct()]
+    build_images(
+        current_app.static_folder,
+        pictures,
+        current_app.config["IMAGE_WIDTHS"],
+        workers,
+        force,
+    )
+
+
+@click.command("worker")
+@click.option("--concurrency", default=2, show_default=True)
+@click.option("--burst", is_flag=True, help="Exit once there are no due jobs.")
+@with_appcontext
+def worker(concurrency, burst):
+    from food_delivery.jobs import run_worker
+
+    run_worker(current_app._get_current_object(), concurrency, burst)
+
+
+@click.command("kitchen")
+@click.option("--interval", default=30.0, show_default=True)
+@click.option("--once", is_flag=True, help="Run a single planning tick.")
+@with_appcontext
+def kitchen(interval, once):
+    from food_delivery.kitchen import run_kitchen
+
+    run_kitchen(current_app._get_current_object(), interval, once)
+
+
+@click.command("purge-idempotency-keys")
+@with_appcontext
+def purge_idempotency_keys():
+    """ Delete stored checkout responses older than IDEMPOTENCY_KEY_TTL. """
+    from food_delivery.idempotency import purge_expired
+
+    ttl = current_app.config["IDEMPOTENCY_KEY_TTL"]
+    print(f"Deleted {purge_expired(ttl)} keys.")
+
+
+@click.command("purge-carts")
+@with_appcontext
+def purge_carts():
+    """ Delete expired carts from the carts table. """
+    from food_delivery.cart import cart_store
+
+    store = cart_store()
+    if hasattr(store, "purge_expired"):
+        print(f"Deleted {store.purge_expired()} expired carts.")
+
+
+@click.command("bench-hash")
+@click.option("--rounds", default=50, show_default=True)
+@click.option("--concurrency", default=1, show_default=True)
+@click.option("--iterations", type=int, help="Override PASSWORD_HASH_ITERATIONS.")
+@with_appcontext
+def bench_hash(rounds, concurrency, iterations):
+    """ Time password hashing with the current policy. """
+    from food_delivery.passwords import hash_method, time_hashes
+
+    config = current_app.config
+    if iterations:
+        method = f"{config['PASSWORD_HASH_ALGORITHM']}:{iterations}"
+    else:
+        method = hash_method(config)
+    time_hashes(method, rounds, concurrency)
+
+
+@click.command("backfill-stats")
+@with_appcontext
+def backfill_stats():
+    from food_delivery.stats import backfill
+
+    backfill()
+
+
+@click.command("import-profile")
+@click.option("--top", default=20, show_default=True)
+@click.option("--preload", is_flag=True, help="Include the setup left to requests.")
+def import_profile(top, preload):
+    """ Time a cold create_app() in a fresh interpreter with -X importtime. """
+    from food_delivery.startup import print_import_profile, profile_imports
+
+    print_import_profile(profile_imports(preload), top)
 
-@app.cli.command("seed")
-def seed():
-    from food_delivery.seeder import seed
-    seed()
 
+COMMANDS = (
+    seed,
+    check_query_plans,
+    build_images,
+    worker,
+    kitchen,
+    purge_idempotency_keys,
+    purge_carts,
+    bench_hash,
+    backfill_stats,
+    import_profile,
+    LazyGroup(
+        "bench",
+        "food_delivery.bench:bench_cli",
+        help="Seed synthetic data and benchmark the storefront.",
+    ),
+    LazyGroup(
+        "export",
+        "food_delivery.export:export_cli",
+        help="Stream the catalog or orders as CSV or JSONL.",
+    ),
+)
@@ -1,39 +1,173 @@
+from datetime import datetime
+
+from flask import Response, abort, current_app, request, stream_with_context
+from flask_admin import Admin, BaseView, expose
 from flask_admin.contrib.sqla import ModelView
 
-from food_delivery.models import db, User, Dish, Category, Order
+from food_delivery.export import FORMATS, encode, export_rows
+from food_delivery.kitchen import kitchen_plan
+from food_delivery.menu import menu_cache
+from food_delivery.models import (
+    db,
+    User,
+    Dish,
+    Category,
+    Order,
+    OrderStatusType,
+    Job,
+)
+from food_delivery.principals import principal_cache
+from food_delivery.stats import dashboard, forget_order, record_order_change
+
+
+class ProfiledModelView(ModelView):
+    loader_profile = None
+
+    def get_query(self):
+        query = super().get_query()
+        if self.loader_profile:
+            query = query.profile(self.loader_profile)
+        return query
+
+
+class MenuInvalidationMixin:
+    def after_model_change(self, form, model, is_created):
+        menu_cache.invalidate()
 
+    def after_model_delete(self, model):
+        menu_cache.invalidate()
 
-class UserView(ModelView):
+
+class UserView(ProfiledModelView):
+    loader_profile = "admin_users"
     column_list = ["email", "name", "orders"]
     column_searchable_list = ["email", "name"]
     column_filters = ["email", "name"]
     page_size = 20
 
+    def after_model_change(self, form, model, is_created):
+        principal_cache.invalidate(model.id)
+
+    def after_model_delete(self, model):
+        principal_cache.invalidate(model.id)
+
 
-class DishView(ModelView):
+class DishView(MenuInvalidationMixin, ProfiledModelView):
+    loader_profile = "admin_dishes"
     column_list = ["title", "price", "description", "categories"]
-    column_searchable_list = ["title", "description", "price"]
+    column_searchable_list = ["title", "description"]
     column_filters = ["title", "description"]
     column_sortable_list = ["title", "price"]
+    form_excluded_columns = ["orders"]
     page_size = 20
 
 
-class CategoryView(ModelView):
+class CategoryView(MenuInvalidationMixin, ProfiledModelView):
+    loader_profile = "admin_categories"
     column_list = ["title", "dishes"]
     column_searchable_list = ["title"]
     column_filters = ["title"]
 
 
-class OrderView(ModelView):
-    column_list = ["date", "user", "total", "dishes", "phone", "address", "status"]
+class OrderView(ProfiledModelView):
+    loader_profile = "admin_orders"
+    column_list = [
+        "date",
+        "user",
+        "total",
+        "lines",
+        "phone",
+        "address",
+        "zone",
+        "kitchen_slot",
+        "status",
+    ]
     column_sortable_list = ["date", ("user", "user.email"), "total"]
-    column_filters = ["phone", "address"]
+    column_filters = ["phone", "address", "zone", "status"]
     column_searchable_list = ["phone", "address"]
+    form_excluded_columns = ["lines", "dishes", "kitchen_slot"]
     page_size = 25
 
+    def on_model_change(self, form, model, is_created):
+        record_order_change(model, is_created)
+
+    def on_model_delete(self, model):
+        forget_order(model)
+
+
+class AnalyticsView(BaseView):
+    @expose("/")
+    def index(self):
+        days = request.args.get("days", 30, type=int)
+        daily, top_dishes, statuses = dashboard(max(1, min(days, 366)))
+        return self.render(
+            "admin/analytics.html",
+            days=days,
+            daily=daily,
+            top_dishes=top_dishes,
+            statuses=statuses,
+        )
+
+
+class KitchenView(BaseView):
+    @expose("/")
+    def index(self):
+        config = current_app.config
+        slots = {}
+        for slot, *batch in kitchen_plan(config["KITCHEN_CAPACITY"]):
+            slots.setdefault(slot, []).append(batch)
+        return self.render(
+            "admin/kitchen.html",
+            slots=slots,
+            slot_minutes=config["KITCHEN_SLOT_MINUTES"],
+        )
+
+
+def parse_day(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d") if value else None
+    except ValueError:
+        abort(400)
+
+
+class ExportView(BaseView):
+    @expose("/")
+    def index(self):
+        return self.render(
+            "admin/export.html", formats=FORMATS, statuses=OrderStatusType
+        )
+
+    @expose("/<any(categories, dishes, orders):kind>.<any(csv, jsonl):format>")
+    def download(self, kind, format):
+        rows, fields = export_rows(
+            kind,
+            since=parse_day(request.args.get("since")),
+            until=parse_day(request.args.get("until")),
+            statuses=request.args.getlist("status"),
+        )
+        return Response(
+            stream_with_context(encode(rows, fields, format)),
+            mimetype=FORMATS[format],
+            headers={"Content-Disposition": f"attachment; filename={kind}.{format}"},
+        )
+
+
+class JobView(ModelView):
+    can_create = False
+    can_edit = False
+    column_list = ["kind", "status", "attempts", "run_at", "finished_at", "last_error"]
+    column_filters = ["kind", "status"]
+    column_default_sort = ("id", True)
+    page_size = 50
+
 
-def init_admin(admin):
+def init_admin(app):
+    admin = Admin(app)
     admin.add_view(UserView(User, db.session, name="Пользователи"))
     admin.add_view(DishView(Dish, db.session, name="Блюда"))
     admin.add_view(CategoryView(Category, db.session, name="Категории блюд"))
     admin.add_view(OrderView(Order, db.session, name="Заказы"))
+    admin.add_view(AnalyticsView(name="Аналитика", endpoint="analytics"))
+    admin.add_view(KitchenView(name="Кухня", endpoint="kitchen"))
+    admin.add_view(ExportView(name="Выгрузка", endpoint="export"))
+    admin.add_view(JobView(Job, db.session, name="Фоновые задачи"))
@@ -0,0 +1,352 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Blueprint, abort, current_app, jsonify, request
+from flask_login import current_user, login_user, logout_user
+from flask_wtf.csrf import generate_csrf
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+
+from food_delivery.cart import (
+    cart_lines,
+    cart_total,
+    clear_cart,
+    get_or_create_cart,
+    place_order,
+    save_cart,
+    set_quantity,
+)
+from food_delivery.delivery import quote_address
+from food_delivery.forms import LoginForm, OrderForm
+from food_delivery.idempotency import request_key, replay_response, run_once
+from food_delivery.menu import menu_cache
+from food_delivery.models import User
+from food_delivery.orders import decode_cursor, order_history
+from food_delivery.passwords import PasswordHashingBusy
+from food_delivery.stats import status_code
+
+DISH_FIELDS = ("id", "title", "price", "description", "picture")
+ORDER_FIELDS = ("id", "date", "status", "total", "phone", "address", "zone", "lines")
+MIN_COMPRESS_SIZE = 500
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+def login_required(view):
+    """ Answer 401 instead of redirecting to the login page. """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(401, "Log in first")
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def requested_fields(allowed):
+    """ Fields named in ?fields=a,b, all of them when absent; 400 on unknown ones. """
+    fields = request.args.get("fields")
+    if not fields:
+        return allowed
+    fields = tuple(field for field in fields.split(",") if field)
+    if not set(fields) <= set(allowed):
+        abort(400, f"Unknown fields; choose from {', '.join(allowed)}")
+    return fields
+
+
+def json_form(form_class):
+    """ Validate a JSON body with a web form; CSRF is checked from the header. """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400, "Expected a JSON object")
+    return form_class(
+        formdata=MultiDict({key: str(value) for key, value in data.items()}),
+        meta={"csrf": False},
+    )
+
+
+def form_errors(form):
+    return jsonify({"error": "Invalid data", "fields": form.errors}), 422
+
+
+def dish_json(dish, fields):
+    return {field: getattr(dish, field) for field in fields}
+
+
+def cart_json():
+    lines = cart_lines(get_or_create_cart())
+    return {
+        "items": [
+            {"dish_id": dish.id, "title": dish.title, "price": dish.price, "qty": qty}
+            for dish, qty in lines
+        ],
+        "count": sum(qty for _, qty in lines),
+        "total": cart_total(lines),
+    }
+
+
+def order_json(order, fields):
+    values = {
+        "id": order.id,
+        "date": order.date.isoformat(),
+        "status": status_code(order.status),
+        "total": order.total,
+        "phone": order.phone,
+        "address": order.address,
+        "zone": order.zone,
+    }
+    if "lines" in fields:
+        values["lines"] = [
+            {
+                "dish_id": line.dish_id,
+                "title": line.title,
+                "qty": line.qty,
+                "unit_price": line.unit_price,
+            }
+            for line in order.lines
+        ]
+    return {field: values[field] for field in fields}
+
+
+def catalog_body(menu, fields):
+    return json.dumps(
+        {
+            "categories": [
+                {
+                    "id": category.id,
+                    "title": category.title,
+                    "dishes": [dish.id for dish in category.dishes],
+                }
+                for category in menu.categories
+            ],
+            "dishes": [dish_json(dish, fields) for dish in menu.dishes.values()],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+def private(response):
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    return response
+
+
+class BodyCache:
+    """ Encoded response bodies by ETag and content coding, so the catalog is built once. """
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compress):
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+                return body
+        body = compress()
+        with self._lock:
+            self._bodies[key] = body
+            while len(self._bodies) > self.max_size:
+                self._bodies.popitem(last=False)
+        return body
+
+
+body_cache = BodyCache()
+
+
+def brotli_module():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compressor(accept_encoding):
+    """ (encoding, compress function) for the best supported encoding, or None. """
+    brotli = brotli_module()
+    if brotli is not None and accept_encoding["br"]:
+        return "br", lambda data: brotli.compress(data, quality=5)
+    if accept_encoding["gzip"]:
+        return "gzip", lambda data: gzip.compress(data, compresslevel=6)
+    return None
+
+
+@api.after_request
+def compress(response):
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or (response.content_length or 0) < MIN_COMPRESS_SIZE
+    ):
+        return response
+    chosen = compressor(request.accept_encodings)
+    if chosen is None:
+        return response
+    encoding, compress_data = chosen
+    etag, _ = response.get_etag()
+    if etag:
+        body = body_cache.get(
+            (etag, encoding), lambda: compress_data(response.get_data())
+        )
+    else:
+        body = compress_data(response.get_data())
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+# The app renders HTML for these codes, and code-specific handlers win over classes.
+@api.errorhandler(404)
+@api.errorhandler(429)
+@api.errorhandler(500)
+@api.errorhandler(HTTPException)
+def http_error(error):
+    response = jsonify({"error": error.description})
+    response.status_code = error.code
+    if error.code == 429:
+        response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
+@api.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(error):
+    response = jsonify({"error": "The server is busy, try again later"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
+@api.route("/csrf-token/")
+def csrf_token():
+    """ Token for the X-CSRFToken header of later POST, PUT and DELETE requests. """
+    return private(jsonify({"csrf_token": generate_csrf()}))
+
+
+@api.route("/login/", methods=["POST"])
+def login():
+    form = json_form(LoginForm)
+    if not form.validate():
+        return form_errors(form)
+    user = User.query.filter_by(email=form.email.data).first()
+    if user is None or not user.password_valid(form.password.data):
+        abort(401, "Wrong email or password")
+    user.rehash_password(form.password.data)
+    login_user(user)
+    return private(jsonify({"id": user.id, "name": user.name, "email": user.email}))
+
+
+@api.route("/logout/", methods=["POST"])
+def logout():
+    logout_user()
+    return "", 204
+
+
+@api.route("/catalog/")
+def catalog():
+    """ Categories with their dish ids and the dishes, revalidated by ETag. """
+    fields = requested_fields(DISH_FIELDS)
+    menu = menu_cache.get()
+    etag = f"{menu.digest}-{','.join(fields)}"
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(
+            body_cache.get((etag, "identity"), lambda: catalog_body(menu, fields)),
+            mimetype="application/json",
+        )
+    # Weak, since the same JSON may be sent gzip-, brotli- or un-encoded.
+    response.set_etag(etag, weak=True)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+
+@api.route("/cart/")
+def cart():
+    return private(jsonify(cart_json()))
+
+
+@api.route("/cart/items/<int:dish_id>/", methods=["PUT", "DELETE"])
+def cart_item(dish_id):
+    """PUT {"qty": n} sets the quantity of a dish, DELETE removes it."""
+    qty = 0
+    if request.method == "PUT":
+        data = request.get_json(silent=True) or {}
+        qty = data.get("qty")
+        # bool is an int subclass; {"qty": true} is not a quantity.
+        if type(qty) is not int or not 0 <= qty <= 99:
+            abort(400, "qty must be an integer from 0 to 99")
+    menu = menu_cache.get()
+    if qty and dish_id not in menu.dishes:
+        abort(404, "No such dish")
+    cart = get_or_create_cart()
+    set_quantity(cart, dish_id, qty, menu.dishes)
+    save_cart(cart)
+    return private(jsonify(cart_json()))
+
+
+@api.route("/orders/")
+@login_required
+def orders():
+    """ Order history, newest first; follow next_cursor with ?before=. """
+    fields = requested_fields(ORDER_FIELDS)
+    before = request.args.get("before")
+    if before is not None:
+        before = decode_cursor(before)
+        if before is None:
+            abort(400, "Malformed cursor")
+    limit = request.args.get("limit", 10, type=int)
+    page, next_cursor = order_history(current_user.id, max(1, min(limit, 50)), before)
+    return private(
+        jsonify(
+            {
+                "orders": [order_json(order, fields) for order in page],
+                "next_cursor": next_cursor,
+            }
+        )
+    )
+
+
+@api.route("/orders/", methods=["POST"])
+@login_required
+def create_order():
+    """ Check out the cart; send an Idempotency-Key header to make retries safe. """
+    key = request_key()
+    if key is not None:
+        replayed = replay_response(current_user.id, key)
+        if replayed is not None:
+            return replayed
+
+    form = json_form(OrderForm)
+    if not form.validate():
+        return form_errors(form)
+    cart = get_or_create_cart()
+    lines = cart_lines(cart)
+    if not lines or len(lines) != len(cart["items"]):
+        abort(409, "The cart is empty or has dishes that are no longer sold")
+    quote = quote_address(form.address.data)
+    if quote.located and quote.zone is None:
+        form.address.errors.append("Мы не доставляем по этому адресу")
+        return form_errors(form)
+
+    def checkout():
+        order = place_order(
+            current_user.id, form.phone.data, form.address.data, lines, quote.zone
+        )
+        response = jsonify(dict(order_json(order, ORDER_FIELDS), eta=quote.eta))
+        response.status_code = 201
+        return response
+
+    response = run_once(current_user.id, key, checkout)
+    clear_cart()
+    return private(response)
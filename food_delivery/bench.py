@@ -0,0 +1,510 @@
+import http.client
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlsplit
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event
+
+from food_delivery.models import (
+    db,
+    categories_dishes_association,
+    Category,
+    Dish,
+    Order,
+    OrderLine,
+    OrderStatusType,
+    User,
+)
+from food_delivery.seeder import chunked
+from food_delivery.stats import backfill
+
+BENCH_EMAIL = "bench{}@example.com"
+BENCH_PASSWORD = "bench-password"
+WORDS = (
+    "пицца салат суп ролл бургер паста соус сыр курица говядина лосось креветки "
+    "грибы томаты острый сливочный копчёный домашний классический овощной"
+).split()
+HTTP_PATHS = ("/", "/cart/", "/search/suggest/?q=сыр")
+
+bench_cli = AppGroup("bench", help="Seed synthetic data and benchmark the storefront.")
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def summarize(timings):
+    """ Latency percentiles in milliseconds for a list of durations in seconds. """
+    timings = sorted(timings)
+    if not timings:
+        return {"count": 0}
+    return {
+        "count": len(timings),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p90_ms": round(percentile(timings, 0.9) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+        "max_ms": round(timings[-1] * 1000, 3),
+    }
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except OSError:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def insert_chunks(table, rows, chunk_size):
+    for chunk in chunked(rows, chunk_size):
+        db.session.execute(table.insert(), chunk)
+    db.session.commit()
+
+
+def seed_bench(categories, dishes, users, orders, chunk_size, rng):
+    """ Insert a synthetic catalog, user base and order history. """
+    started = time.perf_counter()
+    password_hash = User(password=BENCH_PASSWORD).password_hash
+
+    insert_chunks(
+        Category.__table__,
+        ({"title": f"Bench category {i}"} for i in range(categories)),
+        chunk_size,
+    )
+    category_ids = [
+        category_id
+        for category_id, in db.session.query(Category.id).filter(
+            Category.title.like("Bench category %")
+        )
+    ]
+
+    insert_chunks(
+        Dish.__table__,
+        (
+            {
+                "title": f"Bench dish {i} {' '.join(rng.sample(WORDS, 2))}",
+                "price": rng.randrange(100, 1500, 10),
+                "description": " ".join(rng.sample(WORDS, 6)),
+                "picture": f"dish{rng.randint(1, 25)}.jpeg",
+            }
+            for i in range(dishes)
+        ),
+        chunk_size,
+    )
+    dish_rows = (
+        db.session.query(Dish.id, Dish.price, Dish.title)
+        .filter(Dish.title.like("Bench dish %"))
+        .all()
+    )
+    insert_chunks(
+        categories_dishes_association,
+        (
+            {"category_id": category_id, "dish_id": dish_id}
+            for dish_id, _, _ in dish_rows
+            for category_id in rng.sample(category_ids, min(2, len(category_ids)))
+        ),
+        chunk_size,
+    )
+
+    insert_chunks(
+        User.__table__,
+        (
+            {
+                "name": f"Bench user {i}",
+                "email": BENCH_EMAIL.format(i),
+                "password_hash": password_hash,
+                "is_admin": i == 0,
+            }
+            for i in range(users)
+        ),
+        chunk_size,
+    )
+    user_ids = [
+        user_id
+        for user_id, in db.session.query(User.id).filter(
+            User.email.like(BENCH_EMAIL.format("%"))
+        )
+    ]
+
+    statuses = [status for status, _ in OrderStatusType]
+    now = datetime.utcnow()
+    next_order_id = (db.session.query(db.func.max(Order.id)).scalar() or 0) + 1
+    for chunk in chunked(range(next_order_id, next_order_id + orders), chunk_size):
+        order_rows, line_rows = [], []
+        for order_id in chunk:
+            lines = rng.sample(dish_rows, min(rng.randint(1, 4), len(dish_rows)))
+            qtys = [rng.randint(1, 3) for _ in lines]
+            order_rows.append(
+                {
+                    "id": order_id,
+                    "date": now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+                    "total": sum(
+                        (price or 0) * qty for (_, price, _), qty in zip(lines, qtys)
+                    ),
+                    "status": rng.choice(statuses),
+                    "phone": f"+7999{rng.randrange(10 ** 7):07d}",
+                    "address": f"Bench street {rng.randint(1, 500)}",
+                    "user_id": rng.choice(user_ids),
+                }
+            )
+            line_rows.extend(
+                {
+                    "order_id": order_id,
+                    "dish_id": dish_id,
+                    "qty": qty,
+                    "unit_price": price or 0,
+                    "title": title,
+                }
+                for (dish_id, price, title), qty in zip(lines, qtys)
+            )
+        db.session.execute(Order.__table__.insert(), order_rows)
+        db.session.execute(OrderLine.__table__.insert(), line_rows)
+        db.session.commit()
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(
+            "SELECT setval(pg_get_serial_sequence('orders', 'id'), max(id)) FROM orders"
+        )
+        db.session.commit()
+
+    backfill()
+
+    print(
+        f"Seeded {categories} categories, {dishes} dishes, {users} users and "
+        f"{orders} orders in {time.perf_counter() - started:.1f}s"
+    )
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self)
+
+
+def login(client, email):
+    response = client.post("/login/", data={"email": email, "password": BENCH_PASSWORD})
+    if response.status_code != 302:
+        sys.exit(f"Could not log in as {email}; run `flask bench seed` first.")
+
+
+def run_flows(app, rounds, warmup, rng):
+    """ Drive the storefront flows through the test client. """
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["RATE_LIMIT_ENABLED"] = False
+    with app.app_context():
+        user_count = (
+            db.session.query(User.id)
+            .filter(User.email.like(BENCH_EMAIL.format("%")))
+            .count()
+        )
+        dish_ids = [dish_id for dish_id, in db.session.query(Dish.id)]
+    if user_count < 2:
+        sys.exit("No bench users found; run `flask bench seed` first.")
+
+    customer, admin = app.test_client(), app.test_client()
+    login(customer, BENCH_EMAIL.format(rng.randrange(1, user_count)))
+    login(admin, BENCH_EMAIL.format(0))
+
+    flows = {
+        "browse": lambda: customer.get("/"),
+        "add_to_cart": lambda: customer.post(
+            "/", data={"dish_id": rng.choice(dish_ids)}
+        ),
+        "cart": lambda: customer.get("/cart/"),
+        "checkout": lambda: customer.post(
+            "/cart/",
+            data={"name": "Bench", "phone": "+79990000000", "address": "Bench street"},
+        ),
+        "account": lambda: customer.get("/account/"),
+        "api_catalog": lambda: customer.get(
+            "/api/v1/catalog/", headers={"Accept-Encoding": "gzip"}
+        ),
+        "search_suggest": lambda: customer.get(
+            "/search/suggest/", query_string={"q": rng.choice(WORDS)[:3]}
+        ),
+        "admin_orders": lambda: admin.get("/admin/order/"),
+    }
+    timings = {name: [] for name in flows}
+    queries = {name: 0 for name in flows}
+    rss_before = rss_mb()
+
+    with QueryCounter(db.get_engine(app)) as counter:
+        for i in range(warmup + rounds):
+            for name, flow in flows.items():
+                before = counter.count
+                started = time.perf_counter()
+                response = flow()
+                elapsed = time.perf_counter() - started
+                if response.status_code >= 400:
+                    sys.exit(f"{name} returned {response.status_code}")
+                if i >= warmup:
+                    timings[name].append(elapsed)
+                    queries[name] += counter.count - before
+
+    return {
+        "flows": {
+            name: dict(
+                summarize(timings[name]),
+                queries_per_request=round(queries[name] / rounds, 2),
+            )
+            for name in flows
+        },
+        "rss_mb": {"before": rss_before, "after": rss_mb()},
+    }
+
+
+def http_load(base_url, paths, concurrency, duration):
+    """ Hit the given paths from concurrent keep-alive connections for duration seconds. """
+    url = urlsplit(base_url)
+    connection_class = (
+        http.client.HTTPSConnection
+        if url.scheme == "https"
+        else http.client.HTTPConnection
+    )
+    deadline = time.monotonic() + duration
+    results = {path: [] for path in paths}
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(offset):
+        connection = connection_class(url.netloc, timeout=30)
+        i = offset
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                connection.request("GET", quote(url.path.rstrip("/") + path, "/?=&"))
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = connection_class(url.netloc, timeout=30)
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    results[path].append(elapsed)
+                else:
+                    errors[0] += 1
+        connection.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(timings) for timings in results.values())
+    return {
+        "url": base_url,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests_per_s": round(total / elapsed, 1),
+        "errors": errors[0],
+        "all": summarize([t for timings in results.values() for t in timings]),
+        "paths": {path: summarize(timings) for path, timings in results.items()},
+    }
+
+
+def dataset_size():
+    return {
+        "dishes": db.session.query(Dish.id).count(),
+        "users": db.session.query(User.id).count(),
+        "orders": db.session.query(Order.id).count(),
+    }
+
+
+@bench_cli.command("seed")
+@click.option("--categories", default=50, show_default=True)
+@click.option("--dishes", default=10000, show_default=True)
+@click.option("--users", default=1000, show_default=True)
+@click.option("--orders", default=100000, show_default=True)
+@click.option("--chunk-size", default=5000, show_default=True)
+@click.option("--random-seed", default=42, show_default=True)
+def seed_command(categories, dishes, users, orders, chunk_size, random_seed):
+    """ Insert a reproducible synthetic dataset. """
+    if db.session.query(User.id).filter_by(email=BENCH_EMAIL.format(0)).first():
+        sys.exit("Bench data is already present.")
+    seed_bench(
+        categories, dishes, users, orders, chunk_size, random.Random(random_seed)
+    )
+
+
+@bench_cli.command("run")
+@click.option("--rounds", default=50, show_default=True)
+@click.option("--warmup", default=5, show_default=True)
+@click.option("--url", help="Also load-test a running server at this base URL.")
+@click.option("--path", "paths", multiple=True, help="Paths for the HTTP load test.")
+@click.option("--concurrency", default=16, show_default=True)
+@click.option("--duration", default=10.0, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False), help="Write JSON here.")
+@click.option("--random-seed", default=42, show_default=True)
+def run_command(rounds, warmup, url, paths, concurrency, duration, output, random_seed):
+    """ Benchmark the storefront flows and print the results as JSON. """
+    app = current_app._get_current_object()
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "database": db.engine.dialect.name,
+        "dataset": dataset_size(),
+    }
+    # Test client requests reuse the command's app context, and with it g, so the
+    # flows run in a thread where every request pushes its own.
+    with ThreadPoolExecutor(1) as executor:
+        flows = executor.submit(
+            run_flows, app, rounds, warmup, random.Random(random_seed)
+        )
+        results.update(flows.result())
+    if url:
+        results["http"] = http_load(url, paths or HTTP_PATHS, concurrency, duration)
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+@bench_cli.command("delivery")
+@click.option("--lookups", default=100000, show_default=True)
+@click.option("--random-seed", default=42, show_default=True)
+def delivery_command(lookups, random_seed):
+    """ Time checkout address quotes against the delivery zones. """
+    from food_delivery.delivery import delivery_map, quote_address
+
+    rng = random.Random(random_seed)
+    known = list(delivery_map().geocoder)
+    addresses = [
+        f"{rng.choice(known)}, кв. {rng.randint(1, 300)}"
+        if rng.random() < 0.9
+        else f"{rng.choice(WORDS)} улица, {rng.randint(1, 100)}"
+        for _ in range(lookups)
+    ]
+    quote_address(addresses[0])
+
+    timings = []
+    zones = {}
+    for address in addresses:
+        started = time.perf_counter()
+        quote = quote_address(address)
+        timings.append(time.perf_counter() - started)
+        zones[quote.zone] = zones.get(quote.zone, 0) + 1
+    timings.sort()
+    print(
+        f"{lookups} lookups in {sum(timings):.2f} s: "
+        f"mean {sum(timings) / lookups * 1e6:.1f} µs, "
+        f"p50 {percentile(timings, 0.5) * 1e6:.1f} µs, "
+        f"p99 {percentile(timings, 0.99) * 1e6:.1f} µs, "
+        f"max {timings[-1] * 1e6:.1f} µs"
+    )
+    for zone, count in sorted(zones.items(), key=lambda item: -item[1]):
+        print(f"  {zone or '—'}: {count}")
+
+
+@bench_cli.command("kitchen")
+@click.option("--orders", default=5000, show_default=True)
+@click.option("--dishes", default=200, show_default=True)
+@click.option("--random-seed", default=42, show_default=True)
+def kitchen_command(orders, dishes, random_seed):
+    """ Time planning pending orders into kitchen slots, without the database. """
+    from food_delivery.kitchen import KitchenPlan, slot_start
+
+    config = current_app.config
+    slot = timedelta(minutes=config["KITCHEN_SLOT_MINUTES"])
+    rng = random.Random(random_seed)
+    churn = max(1, orders // 10)
+    pending = [
+        [(dish_id, rng.randint(1, 3)) for dish_id in rng.sample(range(dishes), 3)]
+        for _ in range(orders + churn)
+    ]
+    released = rng.sample(range(orders), churn)
+    plan = KitchenPlan(slot, config["KITCHEN_CAPACITY"])
+    earliest = slot_start(datetime.utcnow(), slot)
+
+    started = time.perf_counter()
+    for order_id in range(orders):
+        plan.assign(order_id, pending[order_id], earliest)
+    full = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for order_id in released:
+        plan.release(order_id)
+    for order_id in range(orders, orders + churn):
+        plan.assign(order_id, pending[order_id], earliest)
+    incremental = time.perf_counter() - started
+
+    slots = len({start for start, _ in plan.orders.values()})
+    print(f"{orders} orders planned into {slots} slots in {full * 1000:.1f} ms")
+    print(
+        f"{churn} released and {churn} new orders replanned "
+        f"in {incremental * 1000:.1f} ms"
+    )
+
+
+@bench_cli.command("compare")
+@click.argument("baseline", type=click.File(encoding="utf-8"))
+@click.argument("current", type=click.File(encoding="utf-8"))
+@click.option(
+    "--threshold", default=10.0, show_default=True, help="Allowed p50 slowdown, %."
+)
+def compare_command(baseline, current, threshold):
+    """ Compare two `bench run` results; exits with 1 on a regression. """
+    baseline, current = json.load(baseline), json.load(current)
+    regressions = 0
+    print(f"{'flow':<16}{'p50 ms':>18}{'p99 ms':>18}{'queries':>12}")
+    for name, new in current["flows"].items():
+        old = baseline["flows"].get(name)
+        if old is None:
+            continue
+        change = (new["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100
+        regressed = change > threshold or (
+            new["queries_per_request"] > old["queries_per_request"]
+        )
+        regressions += regressed
+        print(
+            f"{name:<16}"
+            f"{old['p50_ms']:>8.2f} → {new['p50_ms']:<7.2f}"
+            f"{old['p99_ms']:>8.2f} → {new['p99_ms']:<7.2f}"
+            f"{old['queries_per_request']:>5g} → {new['queries_per_request']:<4g}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    sys.exit(1 if regressions else 0)
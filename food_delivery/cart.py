@@ -0,0 +1,155 @@
+import secrets
+
+from flask import current_app, g, request
+from sqlalchemy.orm.util import identity_key
+
+from food_delivery.cart_store import create_cart_store
+from food_delivery.jobs import enqueue
+from food_delivery.models import db, Dish, Order, OrderLine
+from food_delivery.stats import record_order
+
+CART_COOKIE = "cart_id"
+
+
+def cart_store():
+    return current_app.extensions["cart_store"]
+
+
+def current_cart_id():
+    cart_id = request.cookies.get(CART_COOKIE)
+    if cart_id and len(cart_id) <= 32 and cart_id.isidentifier():
+        return cart_id
+    return None
+
+
+def empty_cart():
+    return {"items": {}, "count": 0, "total": 0}
+
+
+def get_or_create_cart():
+    if "cart" not in g:
+        cart_id = current_cart_id()
+        cart = cart_store().load(cart_id) if cart_id else None
+        if cart is not None and "count" not in cart:
+            # Carts saved before quantities were tracked map dish ids to prices.
+            items = {item_id: 1 for item_id in cart["items"]}
+            cart = {"items": items, "count": len(items), "total": cart["total"]}
+        g.cart = cart or empty_cart()
+    return g.cart
+
+
+def set_quantity(cart, dish_id, qty, menu_dishes):
+    """ Update one cart line and recount the cart using menu prices. """
+    items = cart["items"]
+    if qty > 0:
+        items[str(dish_id)] = qty
+    else:
+        items.pop(str(dish_id), None)
+    cart["count"] = sum(items.values())
+    cart["total"] = sum(
+        (menu_dishes[int(item_id)].price or 0) * item_qty
+        for item_id, item_qty in items.items()
+        if int(item_id) in menu_dishes
+    )
+
+
+def save_cart(cart):
+    cart_id = current_cart_id() or g.get("new_cart_id")
+    if cart_id is None:
+        cart_id = g.new_cart_id = "c" + secrets.token_hex(15)
+    cart_store().save(cart_id, cart)
+    g.cart = cart
+
+
+def clear_cart():
+    cart_id = current_cart_id()
+    if cart_id:
+        cart_store().delete(cart_id)
+    g.cart = empty_cart()
+
+
+def init_cart(app):
+    app.extensions["cart_store"] = create_cart_store(app.config)
+
+    @app.after_request
+    def set_cart_cookie(response):
+        new_cart_id = g.get("new_cart_id")
+        if new_cart_id:
+            response.set_cookie(
+                CART_COOKIE,
+                new_cart_id,
+                max_age=app.config["CART_TTL"],
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    @app.context_processor
+    def inject_cart():
+        return {"current_cart": get_or_create_cart()}
+
+
+def resolve_dishes(dish_ids):
+    """ Load dishes in cart order, querying only those not in the identity map. """
+    dish_ids = [int(dish_id) for dish_id in dish_ids]
+    found = {}
+    for dish_id in dish_ids:
+        dish = db.session.identity_map.get(identity_key(Dish, dish_id))
+        if dish is not None:
+            found[dish_id] = dish
+
+    missing = set(dish_ids) - found.keys()
+    if missing:
+        for dish in Dish.query.filter(Dish.id.in_(missing)):
+            found[dish.id] = dish
+
+    return [found[dish_id] for dish_id in dish_ids if dish_id in found]
+
+
+def cart_lines(cart):
+    dishes = resolve_dishes(cart["items"])
+    return [(dish, cart["items"][str(dish.id)]) for dish in dishes]
+
+
+def cart_total(lines):
+    return sum((dish.price or 0) * qty for dish, qty in lines)
+
+
+def drop_stale_lines(cart, lines):
+    """ Remove dishes deleted since they were added; True if there were any. """
+    if len(lines) == len(cart["items"]):
+        return False
+    cart["items"] = {str(dish.id): qty for dish, qty in lines}
+    cart["count"] = sum(cart["items"].values())
+    cart["total"] = cart_total(lines)
+    save_cart(cart)
+    return True
+
+
+def place_order(user_id, phone, address, lines, zone=None):
+    """ Add the order and queue its post-processing; the caller commits. """
+    order = Order(
+        phone=phone,
+        address=address,
+        zone=zone,
+        total=cart_total(lines),
+        user_id=user_id,
+    )
+    db.session.add(order)
+    db.session.flush()
+    db.session.execute(
+        OrderLine.__table__.insert(),
+        [
+            {
+                "order_id": order.id,
+                "dish_id": dish.id,
+                "qty": qty,
+                "unit_price": dish.price or 0,
+                "title": dish.title,
+            }
+            for dish, qty in lines
+        ],
+    )
+    record_order(order, [(dish.id, qty, dish.price or 0) for dish, qty in lines])
+    enqueue("order_placed", {"order_id": order.id}, key=f"order_placed:{order.id}")
+    return order
@@ -0,0 +1,140 @@
+import json
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from food_delivery.models import db, Cart
+
+
+class CartStore(ABC):
+    """ Keeps carts server-side, keyed by an opaque cart id. """
+
+    @abstractmethod
+    def load(self, cart_id):
+        """ The cart dict, or None if there is no such cart. """
+
+    @abstractmethod
+    def save(self, cart_id, cart):
+        """ Create or replace the cart. """
+
+    @abstractmethod
+    def delete(self, cart_id):
+        """ Forget the cart; unknown ids are ignored. """
+
+
+class MemoryCartStore(CartStore):
+    """ Per-process LRU store, only suitable for a single worker. """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._carts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, cart_id):
+        with self._lock:
+            data = self._carts.get(cart_id)
+            if data is None:
+                return None
+            self._carts.move_to_end(cart_id)
+        return json.loads(data)
+
+    def save(self, cart_id, cart):
+        data = json.dumps(cart)
+        with self._lock:
+            self._carts[cart_id] = data
+            self._carts.move_to_end(cart_id)
+            while len(self._carts) > self.max_size:
+                self._carts.popitem(last=False)
+
+    def delete(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+
+class SQLCartStore(CartStore):
+    """ Stores carts in the carts table on a connection separate from db.session. """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.table = Cart.__table__
+
+    def load(self, cart_id):
+        expires = datetime.utcnow() - timedelta(seconds=self.ttl)
+        with db.engine.connect() as conn:
+            data = conn.execute(
+                db.select(self.table.c.data).where(
+                    self.table.c.id == cart_id, self.table.c.updated_at >= expires
+                )
+            ).scalar()
+        return json.loads(data) if data is not None else None
+
+    def save(self, cart_id, cart):
+        values = {"data": json.dumps(cart), "updated_at": datetime.utcnow()}
+        with db.engine.begin() as conn:
+            updated = conn.execute(
+                self.table.update().where(self.table.c.id == cart_id).values(**values)
+            )
+            if updated.rowcount:
+                return
+            try:
+                with conn.begin_nested():
+                    conn.execute(self.table.insert().values(id=cart_id, **values))
+            except IntegrityError:
+                conn.execute(
+                    self.table.update()
+                    .where(self.table.c.id == cart_id)
+                    .values(**values)
+                )
+
+    def delete(self, cart_id):
+        with db.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.id == cart_id))
+
+    def purge_expired(self):
+        expires = datetime.utcnow() - timedelta(seconds=self.ttl)
+        with db.engine.begin() as conn:
+            return conn.execute(
+                self.table.delete().where(self.table.c.updated_at < expires)
+            ).rowcount
+
+
+class RedisCartStore(CartStore):
+    """ Works with any client exposing the redis-py get/set/delete calls. """
+
+    def __init__(self, client, ttl, prefix="cart:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def load(self, cart_id):
+        data = self.client.get(self.prefix + cart_id)
+        return json.loads(data) if data is not None else None
+
+    def save(self, cart_id, cart):
+        self.client.set(self.prefix + cart_id, json.dumps(cart), ex=self.ttl)
+
+    def delete(self, cart_id):
+        self.client.delete(self.prefix + cart_id)
+
+
+def redis_client(url):
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError(f"Install the redis package to use {url}")
+    return redis.Redis.from_url(url)
+
+
+def create_cart_store(config):
+    url = config["CART_STORE_URL"]
+    ttl = config["CART_TTL"]
+    if url == "memory":
+        return MemoryCartStore(config["CART_STORE_SIZE"])
+    if url == "sql":
+        return SQLCartStore(ttl)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCartStore(redis_client(url), ttl)
+    raise ValueError(f"Unknown CART_STORE_URL: {url}")
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import re
+import time
+
+from flask import current_app, get_template_attribute, render_template, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+
+CSRF_PLACEHOLDER = "__CSRF_TOKEN__"
+CART_FORM_MARKER = re.compile(r"<!--cart-form:(\d+)-->")
+PAGE_TEMPLATES = (
+    "base.html",
+    "navbar.html",
+    "jumbotron.html",
+    "main.html",
+    "catalog.html",
+    "cart_form.html",
+    "dish_picture.html",
+)
+
+_fragments = [None]
+_template_digest = [None]
+
+
+def pictures_digest():
+    """ Digest of the picture manifest, whose srcsets the catalog embeds. """
+    return current_app.extensions["picture_manifest"].refresh()
+
+
+def catalog_fragments(menu):
+    """ Render the catalog once per snapshot, split around the per-dish cart forms. """
+    pictures = pictures_digest()
+    cached = _fragments[0]
+    if cached is not None and cached[0] is menu and cached[1] == pictures:
+        return cached[2:]
+
+    cart_form = get_template_attribute("cart_form.html", "cart_form")
+    parts = CART_FORM_MARKER.split(
+        render_template("catalog.html", categories=menu.categories)
+    )
+    statics = parts[0::2]
+    dish_ids = [int(dish_id) for dish_id in parts[1::2]]
+    forms = {
+        dish_id: str(cart_form(menu.dishes[dish_id], 0, CSRF_PLACEHOLDER))
+        for dish_id in dish_ids
+    }
+    _fragments[0] = menu, pictures, statics, dish_ids, forms
+    return statics, dish_ids, forms
+
+
+def render_catalog(menu, cart):
+    """ Overlay the visitor's cart state and CSRF token on the cached catalog. """
+    statics, dish_ids, forms = catalog_fragments(menu)
+    items = cart["items"]
+    cart_form = get_template_attribute("cart_form.html", "cart_form")
+
+    pieces = [statics[0]]
+    for dish_id, static in zip(dish_ids, statics[1:]):
+        qty = items.get(str(dish_id))
+        if qty:
+            pieces.append(str(cart_form(menu.dishes[dish_id], qty, CSRF_PLACEHOLDER)))
+        else:
+            pieces.append(forms[dish_id])
+        pieces.append(static)
+    return Markup("".join(pieces).replace(CSRF_PLACEHOLDER, generate_csrf()))
+
+
+def template_digest():
+    if _template_digest[0] is None:
+        env = current_app.jinja_env
+        sources = (env.loader.get_source(env, name)[0] for name in PAGE_TEMPLATES)
+        _template_digest[0] = hashlib.sha1("".join(sources).encode()).hexdigest()
+    return _template_digest[0]
+
+
+def catalog_etag(menu, cart):
+    """ Strong ETag for the catalog page as this visitor would see it. """
+    # The page embeds a CSRF token; rotate the ETag well before a cached token expires.
+    token_lifetime = current_app.config.get("WTF_CSRF_TIME_LIMIT") or 3600
+    generate_csrf()
+    parts = (
+        template_digest(),
+        menu.digest,
+        pictures_digest(),
+        json.dumps(cart["items"], sort_keys=True),
+        str(current_user.get_id()),
+        session.get("csrf_token", ""),
+        str(int(time.time() // (token_lifetime / 2))),
+    )
+    return hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
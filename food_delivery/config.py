@@ -1,13 +1,29 @@
 import os
 
-from dotenv import load_dotenv, find_dotenv
+from dotenv import load_dotenv
 
-load_dotenv(find_dotenv())
+from food_delivery.pool_stats import InstrumentedQueuePool
+
+# .env sits next to the package; variables that are already set win.
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv(os.path.join(ROOT_DIR, ".env"))
 
 DB_URI = os.getenv("DATABASE_URL")
 if DB_URI.startswith("postgres://"):
     DB_URI = DB_URI.replace("postgres://", "postgresql://", 1)
 
+ENGINE_OPTIONS = {
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+}
+if not DB_URI.startswith("sqlite"):
+    ENGINE_OPTIONS.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", 30)),
+    )
+
 
 class Config:
     DEBUG = os.getenv("DEBUG")
@@ -15,3 +31,56 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = DB_URI
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = ENGINE_OPTIONS
+    SQLALCHEMY_QUERY_BUDGET = int(os.getenv("SQLALCHEMY_QUERY_BUDGET", 0))
+    SQLALCHEMY_QUERY_BUDGET_STRICT = bool(os.getenv("SQLALCHEMY_QUERY_BUDGET_STRICT"))
+    METRICS_DIR = os.getenv("METRICS_DIR")
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    METRICS_FLUSH_INTERVAL = int(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+    MENU_CACHE_TTL = int(os.getenv("MENU_CACHE_TTL", 300))
+    MENU_VERSION_CHECK_INTERVAL = float(os.getenv("MENU_VERSION_CHECK_INTERVAL", 5))
+    ACCOUNT_ORDERS_PAGE_SIZE = int(os.getenv("ACCOUNT_ORDERS_PAGE_SIZE", 10))
+    CART_STORE_URL = os.getenv("CART_STORE_URL", "sql")
+    CART_STORE_SIZE = int(os.getenv("CART_STORE_SIZE", 10000))
+    CART_TTL = int(os.getenv("CART_TTL", 7 * 24 * 3600))
+    IMAGE_WIDTHS = tuple(
+        int(width) for width in os.getenv("IMAGE_WIDTHS", "300,600,900").split(",")
+    )
+    IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", 365 * 24 * 3600))
+    IMAGE_MANIFEST_CHECK_INTERVAL = float(os.getenv("IMAGE_MANIFEST_CHECK_INTERVAL", 2))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+    JOB_BACKOFF_BASE = int(os.getenv("JOB_BACKOFF_BASE", 10))
+    JOB_BACKOFF_MAX = int(os.getenv("JOB_BACKOFF_MAX", 3600))
+    JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", 600))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+    SEARCH_MAX_QUERY_LENGTH = int(os.getenv("SEARCH_MAX_QUERY_LENGTH", 100))
+    SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", 30))
+    SEARCH_SUGGEST_SIZE = int(os.getenv("SEARCH_SUGGEST_SIZE", 8))
+    PASSWORD_HASH_ALGORITHM = os.getenv("PASSWORD_HASH_ALGORITHM", "pbkdf2:sha256")
+    PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", 260000))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 16))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 5))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    DELIVERY_ZONES_FILE = os.getenv("DELIVERY_ZONES_FILE")
+    DELIVERY_ADDRESSES_FILE = os.getenv("DELIVERY_ADDRESSES_FILE")
+    DELIVERY_GRID_SIZE = int(os.getenv("DELIVERY_GRID_SIZE", 32))
+    DELIVERY_LOAD_TTL = int(os.getenv("DELIVERY_LOAD_TTL", 15))
+    KITCHEN_SLOT_MINUTES = int(os.getenv("KITCHEN_SLOT_MINUTES", 10))
+    KITCHEN_CAPACITY = int(os.getenv("KITCHEN_CAPACITY", 20))
+    IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 3600))
+    TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_STORE_URL = os.getenv("RATE_LIMIT_STORE_URL", "memory")
+    RATE_LIMIT_STORE_SIZE = int(os.getenv("RATE_LIMIT_STORE_SIZE", 100000))
+    RATE_LIMITS = os.getenv(
+        "RATE_LIMITS",
+        "main.index_view=60/minute burst 20, "
+        "main.cart_increment_view=60/minute burst 20, "
+        "main.cart_view=10/minute burst 3, main.login_view=10/minute, "
+        "main.register_view=5/minute, "
+        "api.cart_item=60/minute burst 20, api.create_order=10/minute burst 3, "
+        "api.login=10/minute",
+    )
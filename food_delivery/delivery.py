@@ -0,0 +1,239 @@
+import csv
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import column, func, select
+
+from food_delivery.models import db, Order
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "delivery-data")
+ZONES_FILE = os.path.join(DATA_DIR, "zones.geojson")
+ADDRESSES_FILE = os.path.join(DATA_DIR, "addresses.csv")
+
+# Everything after these words is the flat, not the building.
+APARTMENT_WORDS = {"кв", "квартира", "подъезд", "под", "этаж", "эт", "офис", "оф"}
+STOPWORDS = {
+    "г",
+    "город",
+    "москва",
+    "ул",
+    "улица",
+    "пр",
+    "пр-т",
+    "просп",
+    "проспект",
+    "ш",
+    "шоссе",
+    "пер",
+    "переулок",
+    "б-р",
+    "бульвар",
+    "наб",
+    "набережная",
+    "пл",
+    "площадь",
+    "д",
+    "дом",
+}
+
+Zone = namedtuple(
+    "Zone",
+    ["name", "polygons", "bbox", "base_minutes", "minutes_per_order", "couriers"],
+)
+Quote = namedtuple("Quote", ["located", "zone", "eta"])
+
+
+def normalize_address(address):
+    """ Reduce an address to sorted street and house tokens. """
+    tokens = []
+    for token in re.findall(r"\w+(?:-\w+)*", address.lower().replace("ё", "е")):
+        if token in APARTMENT_WORDS:
+            break
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return " ".join(sorted(tokens))
+
+
+def load_geocoder(filename):
+    with open(filename, encoding="utf-8") as f:
+        return {
+            normalize_address(row["address"]): (float(row["lat"]), float(row["lon"]))
+            for row in csv.DictReader(f)
+        }
+
+
+def ring_contains(ring, x, y):
+    """ Ray casting test; ring is a closed list of (x, y) vertices. """
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def polygon_contains(polygon, x, y):
+    exterior, *holes = polygon
+    return ring_contains(exterior, x, y) and not any(
+        ring_contains(hole, x, y) for hole in holes
+    )
+
+
+def load_zones(filename):
+    """ Read Polygon and MultiPolygon features; coordinates are lon, lat. """
+    with open(filename, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+
+    zones = []
+    for feature in features:
+        geometry, properties = feature["geometry"], feature["properties"]
+        if geometry["type"] == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry["type"] == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            raise ValueError(f"Unsupported zone geometry {geometry['type']}")
+        polygons = tuple(
+            tuple(tuple((x, y) for x, y in ring) for ring in polygon)
+            for polygon in polygons
+        )
+        xs = [x for polygon in polygons for x, y in polygon[0]]
+        ys = [y for polygon in polygons for x, y in polygon[0]]
+        zones.append(
+            Zone(
+                name=properties["name"],
+                polygons=polygons,
+                bbox=(min(xs), min(ys), max(xs), max(ys)),
+                base_minutes=properties["base_minutes"],
+                minutes_per_order=properties["minutes_per_order"],
+                couriers=properties["couriers"],
+            )
+        )
+    return zones
+
+
+class ZoneGrid:
+    """ Uniform grid over the zone bounding boxes; each cell lists candidate zones. """
+
+    def __init__(self, zones, size):
+        self.size = size
+        self.min_x = min(zone.bbox[0] for zone in zones)
+        self.min_y = min(zone.bbox[1] for zone in zones)
+        self.max_x = max(zone.bbox[2] for zone in zones)
+        self.max_y = max(zone.bbox[3] for zone in zones)
+        self.cell_w = (self.max_x - self.min_x) / size or 1
+        self.cell_h = (self.max_y - self.min_y) / size or 1
+        self.cells = [() for _ in range(size * size)]
+        for zone in zones:
+            x1, y1, x2, y2 = zone.bbox
+            for row in range(self._row(y1), self._row(y2) + 1):
+                for col in range(self._col(x1), self._col(x2) + 1):
+                    self.cells[row * size + col] += (zone,)
+
+    def _col(self, x):
+        return min(int((x - self.min_x) / self.cell_w), self.size - 1)
+
+    def _row(self, y):
+        return min(int((y - self.min_y) / self.cell_h), self.size - 1)
+
+    def locate(self, x, y):
+        if not (self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y):
+            return None
+        for zone in self.cells[self._row(y) * self.size + self._col(x)]:
+            if any(polygon_contains(polygon, x, y) for polygon in zone.polygons):
+                return zone
+        return None
+
+
+class DeliveryMap:
+    """ Offline geocoder plus zone lookup, loaded once per process. """
+
+    def __init__(self, zones, geocoder, grid_size):
+        self.zones = {zone.name: zone for zone in zones}
+        self.geocoder = geocoder
+        self.grid = ZoneGrid(zones, grid_size)
+
+    @classmethod
+    def load(cls, zones_file, addresses_file, grid_size):
+        return cls(load_zones(zones_file), load_geocoder(addresses_file), grid_size)
+
+    def geocode(self, address):
+        return self.geocoder.get(normalize_address(address))
+
+    def locate(self, lat, lon):
+        return self.grid.locate(lon, lat)
+
+
+class ZoneLoad:
+    """ Processing orders per zone, recounted at most every ttl seconds. """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._counts = {}
+        self._expires = 0
+        self._lock = threading.Lock()
+
+    def get(self, zone_name):
+        if time.monotonic() >= self._expires:
+            with self._lock:
+                if time.monotonic() >= self._expires:
+                    # ChoiceType is not hashable for the statement cache.
+                    status = column("status")
+                    self._counts = dict(
+                        db.session.execute(
+                            select(Order.zone, func.count())
+                            .select_from(Order.__table__)
+                            .where(status == "Processing", Order.zone.isnot(None))
+                            .group_by(Order.zone)
+                        ).all()
+                    )
+                    self._expires = time.monotonic() + self.ttl
+        return self._counts.get(zone_name, 0)
+
+
+def estimate_eta(zone, processing):
+    """ Minutes to deliver once the zone's couriers clear the processing queue. """
+    return zone.base_minutes + math.ceil(processing / zone.couriers) * (
+        zone.minutes_per_order
+    )
+
+
+def delivery_map(app=None):
+    """ The app's DeliveryMap, loaded on first use. """
+    app = app or current_app
+    state = app.extensions["delivery_map"]
+    if state["map"] is None:
+        with state["lock"]:
+            if state["map"] is None:
+                config = app.config
+                state["map"] = DeliveryMap.load(
+                    config["DELIVERY_ZONES_FILE"] or ZONES_FILE,
+                    config["DELIVERY_ADDRESSES_FILE"] or ADDRESSES_FILE,
+                    config["DELIVERY_GRID_SIZE"],
+                )
+    return state["map"]
+
+
+def quote_address(address):
+    """ Zone and ETA for an address; located is False for unknown addresses. """
+    geo = delivery_map()
+    point = geo.geocode(address)
+    if point is None:
+        return Quote(False, None, None)
+    zone = geo.locate(*point)
+    if zone is None:
+        return Quote(True, None, None)
+    load = current_app.extensions["delivery_load"].get(zone.name)
+    return Quote(True, zone.name, estimate_eta(zone, load))
+
+
+def init_delivery(app):
+    app.extensions["delivery_map"] = {"map": None, "lock": threading.Lock()}
+    app.extensions["delivery_load"] = ZoneLoad(app.config["DELIVERY_LOAD_TTL"])
@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from itertools import groupby
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import column, select
+
+from food_delivery.models import (
+    db,
+    categories_dishes_association,
+    Category,
+    Dish,
+    Order,
+    OrderLine,
+    OrderStatusType,
+    User,
+)
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+BATCH_SIZE = 1000
+BUFFER_SIZE = 64 * 1024
+
+CATEGORY_FIELDS = ["id", "title"]
+DISH_FIELDS = ["id", "title", "price", "description", "picture", "category_id"]
+ORDER_FIELDS = [
+    "id",
+    "date",
+    "status",
+    "total",
+    "phone",
+    "address",
+    "zone",
+    "user_id",
+    "user_email",
+    "user_name",
+    "lines",
+]
+
+export_cli = AppGroup("export", help="Stream the catalog or orders as CSV or JSONL.")
+
+
+def stream(statement):
+    """ Execute with a server-side cursor, fetching BATCH_SIZE rows at a time. """
+    return db.session.execute(
+        statement.execution_options(stream_results=True)
+    ).yield_per(BATCH_SIZE)
+
+
+def iter_categories():
+    for row in stream(select(Category.id, Category.title).order_by(Category.id)):
+        yield dict(row._mapping)
+
+
+def iter_dishes():
+    """ Dishes in the seeder format, category ids joined with ';'. """
+    rows = stream(
+        select(
+            Dish.id,
+            Dish.title,
+            Dish.price,
+            Dish.description,
+            Dish.picture,
+            categories_dishes_association.c.category_id,
+        )
+        .outerjoin(categories_dishes_association)
+        .order_by(Dish.id, categories_dishes_association.c.category_id)
+    )
+    for _, dish_rows in groupby(rows, key=lambda row: row.id):
+        dish_rows = list(dish_rows)
+        dish = dict(dish_rows[0]._mapping)
+        dish["category_id"] = ";".join(
+            str(row.category_id) for row in dish_rows if row.category_id is not None
+        )
+        yield dish
+
+
+def iter_orders(since=None, until=None, statuses=()):
+    """ Orders with their user and lines, oldest first; until is inclusive. """
+    # ChoiceType is not hashable for the statement cache, so refer to the bare column.
+    status = column("status")
+    orders = Order.__table__
+    statement = (
+        select(
+            orders.c.id,
+            orders.c.date,
+            status,
+            orders.c.total,
+            orders.c.phone,
+            orders.c.address,
+            orders.c.zone,
+            orders.c.user_id,
+            User.email.label("user_email"),
+            User.name.label("user_name"),
+            OrderLine.dish_id,
+            OrderLine.title,
+            OrderLine.qty,
+            OrderLine.unit_price,
+        )
+        .select_from(orders)
+        .outerjoin(User, User.id == orders.c.user_id)
+        .outerjoin(OrderLine, OrderLine.order_id == orders.c.id)
+        .order_by(orders.c.id, OrderLine.dish_id)
+    )
+    if since is not None:
+        statement = statement.where(orders.c.date >= since)
+    if until is not None:
+        statement = statement.where(orders.c.date < until + timedelta(days=1))
+    if statuses:
+        statement = statement.where(status.in_(statuses))
+
+    for _, order_rows in groupby(stream(statement), key=lambda row: row.id):
+        order_rows = list(order_rows)
+        order = {field: order_rows[0]._mapping[field] for field in ORDER_FIELDS[:-1]}
+        order["lines"] = [
+            {
+                "dish_id": row.dish_id,
+                "title": row.title,
+                "qty": row.qty,
+                "unit_price": row.unit_price,
+            }
+            for row in order_rows
+            if row.dish_id is not None
+        ]
+        yield order
+
+
+def flat_lines(lines):
+    return ";".join(
+        f"{line['dish_id']}:{line['qty']}:{line['unit_price']}" for line in lines
+    )
+
+
+def to_text(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode(rows, fields, format):
+    """ Yield the rows as CSV or JSONL text in chunks of about BUFFER_SIZE. """
+    buffer = io.StringIO()
+    if format == "csv":
+        writer = csv.DictWriter(buffer, fields)
+        writer.writeheader()
+    for row in rows:
+        if format == "csv":
+            if "lines" in row:
+                row = dict(row, lines=flat_lines(row["lines"]))
+            writer.writerow({key: to_text(value) for key, value in row.items()})
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False, default=to_text))
+            buffer.write("\n")
+        if buffer.tell() >= BUFFER_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_rows(kind, since=None, until=None, statuses=()):
+    """ Return (rows, fields) for an export kind. """
+    if kind == "categories":
+        return iter_categories(), CATEGORY_FIELDS
+    if kind == "dishes":
+        return iter_dishes(), DISH_FIELDS
+    return iter_orders(since, until, statuses), ORDER_FIELDS
+
+
+def write_export(kind, format, output, **filters):
+    rows, fields = export_rows(kind, **filters)
+    for chunk in encode(rows, fields, format):
+        output.write(chunk)
+
+
+format_option = click.option(
+    "--format", "format", type=click.Choice(FORMATS), default="csv", show_default=True
+)
+output_option = click.option(
+    "--output", "-o", type=click.File("w", encoding="utf-8"), default="-"
+)
+
+
+@export_cli.command("categories")
+@format_option
+@output_option
+def export_categories(format, output):
+    """ Categories in the seeder format. """
+    write_export("categories", format, output)
+
+
+@export_cli.command("dishes")
+@format_option
+@output_option
+def export_dishes(format, output):
+    """ Dishes in the seeder format. """
+    write_export("dishes", format, output)
+
+
+@export_cli.command("orders")
+@format_option
+@output_option
+@click.option("--since", type=click.DateTime(["%Y-%m-%d"]), help="First day.")
+@click.option("--until", type=click.DateTime(["%Y-%m-%d"]), help="Last day.")
+@click.option(
+    "--status",
+    "statuses",
+    multiple=True,
+    type=click.Choice([code for code, _ in OrderStatusType]),
+)
+def export_orders(format, output, since, until, statuses):
+    """ Orders with their user and dishes. """
+    write_export("orders", format, output, since=since, until=until, statuses=statuses)
@@ -1,7 +1,8 @@
-from babel import dates
-from food_delivery import app
-
-
-@app.template_filter("date_format_ru")
 def date_format_ru(date):
+    from babel import dates
+
     return dates.format_datetime(date, "dd MMMM YYYY", locale="ru_RU")
+
+
+def init_filters(app):
+    app.add_template_filter(date_format_ru)
@@ -1,7 +1,7 @@
 from flask_wtf.form import FlaskForm
 from wtforms.fields.core import StringField
 from wtforms.fields.html5 import EmailField, TelField
-from wtforms.fields.simple import SubmitField, PasswordField
+from wtforms.fields.simple import SubmitField, PasswordField, HiddenField
 from wtforms.validators import DataRequired, Length, Email, EqualTo
 
 
@@ -60,4 +60,5 @@ class OrderForm(FlaskForm):
             ),
         ],
     )
+    idempotency_key = HiddenField()
     submit = SubmitField("Оформить заказ")
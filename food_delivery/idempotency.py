@@ -0,0 +1,108 @@
+import hashlib
+import json
+import secrets
+from datetime import datetime, timedelta
+
+from flask import abort, current_app, request
+from sqlalchemy.exc import IntegrityError
+
+from food_delivery.cart import get_or_create_cart
+from food_delivery.models import db, IdempotencyKey
+
+KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+STORED_HEADERS = ("Location", "Content-Type")
+
+
+def new_key():
+    return secrets.token_urlsafe(24)
+
+
+def request_key(form_key=None):
+    """ The client's key from the header or a hidden form field, if it is usable. """
+    key = request.headers.get(KEY_HEADER) or form_key
+    if key and len(key) <= 64:
+        return key
+    return None
+
+
+def digest(value):
+    data = json.dumps(value, ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()[:32]
+
+
+def request_fingerprint():
+    """ Digest of the submitted data followed by a digest of the cart it checks out. """
+    if request.is_json:
+        fields = sorted((request.get_json(silent=True) or {}).items())
+    else:
+        fields = sorted(
+            (name, value)
+            for name, value in request.form.items(multi=True)
+            if name not in ("csrf_token", "idempotency_key")
+        )
+    items = get_or_create_cart()["items"]
+    lines = sorted((int(dish_id), qty) for dish_id, qty in items.items())
+    return digest([request.path, fields]) + (digest(lines) if lines else "")
+
+
+def fingerprint_matches(stored, current):
+    # The first attempt empties the cart, so a retry carries no cart of its own.
+    return stored == current or (len(current) == 32 and stored[:32] == current)
+
+
+def replay_response(user_id, key):
+    """ The response stored under key, or None; 422 if the key was used for other data. """
+    record = IdempotencyKey.query.get((user_id, key))
+    if record is None:
+        return None
+    if not fingerprint_matches(record.fingerprint, request_fingerprint()):
+        abort(422)
+    response = current_app.response_class(
+        record.body, record.status_code, json.loads(record.headers)
+    )
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def run_once(user_id, key, action):
+    """ Run action and commit its writes together with the response it returns. """
+    fingerprint = request_fingerprint() if key is not None else None
+    try:
+        response = action()
+        if key is not None:
+            db.session.add(
+                IdempotencyKey(
+                    user_id=user_id,
+                    key=key,
+                    fingerprint=fingerprint,
+                    status_code=response.status_code,
+                    headers=json.dumps(
+                        {
+                            name: response.headers[name]
+                            for name in STORED_HEADERS
+                            if name in response.headers
+                        }
+                    ),
+                    body=response.get_data(),
+                    created_at=datetime.utcnow(),
+                )
+            )
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request with the same key committed first.
+        db.session.rollback()
+        replayed = replay_response(user_id, key) if key is not None else None
+        if replayed is None:
+            raise
+        return replayed
+    return response
+
+
+def purge_expired(ttl):
+    expires = datetime.utcnow() - timedelta(seconds=ttl)
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.created_at < expires).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+    return deleted
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from flask import request, url_for
+
+DERIVED_DIR = "pictures/derived"
+MANIFEST = "manifest.json"
+FORMATS = {
+    "webp": ("WEBP", {"quality": 75, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+}
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def derive_picture(source, out_dir, widths):
+    """ Write resized WebP/JPEG variants of one picture; runs in a worker process. """
+    from io import BytesIO
+
+    from PIL import Image
+
+    stem = os.path.splitext(os.path.basename(source))[0]
+    variants = {name: [] for name in FORMATS}
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        source_width = image.width
+        targets = sorted({min(width, source_width) for width in widths})
+        for width in targets:
+            height = round(image.height * width / source_width)
+            resized = image.resize((width, height), Image.LANCZOS)
+            for name, (image_format, options) in FORMATS.items():
+                buffer = BytesIO()
+                resized.save(buffer, image_format, **options)
+                data = buffer.getvalue()
+                digest = hashlib.sha1(data).hexdigest()[:10]
+                filename = f"{stem}-{width}.{digest}.{name}"
+                path = os.path.join(out_dir, filename)
+                if not os.path.exists(path):
+                    with open(path + ".tmp", "wb") as f:
+                        f.write(data)
+                    os.replace(path + ".tmp", path)
+                variants[name].append([width, filename])
+    return {"width": source_width, "variants": variants}
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def is_current(entry, source_hash, out_dir):
+    return (
+        entry is not None
+        and entry["source_hash"] == source_hash
+        and all(
+            os.path.exists(os.path.join(out_dir, filename))
+            for variants in entry["variants"].values()
+            for _, filename in variants
+        )
+    )
+
+
+def build_images(static_folder, pictures, widths, workers=None, force=False):
+    """ Generate derivatives for changed pictures and rewrite the manifest. """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Install Pillow to build image derivatives")
+
+    started = time.perf_counter()
+    out_dir = os.path.join(static_folder, DERIVED_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+
+    pending = {}
+    missing = 0
+    for picture in sorted(set(pictures)):
+        source = os.path.join(static_folder, "pictures", picture)
+        if not os.path.isfile(source):
+            missing += 1
+            continue
+        source_hash = file_hash(source)
+        if force or not is_current(manifest.get(picture), source_hash, out_dir):
+            pending[picture] = source, source_hash
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(derive_picture, source, out_dir, widths): picture
+            for picture, (source, _) in pending.items()
+        }
+        for future in as_completed(futures):
+            picture = futures[future]
+            entry = future.result()
+            entry["source_hash"] = pending[picture][1]
+            manifest[picture] = entry
+
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+    print(
+        f"Built {len(pending)} pictures, skipped {len(set(pictures)) - len(pending) - missing} "
+        f"unchanged, {missing} missing, in {time.perf_counter() - started:.2f}s"
+    )
+
+
+class PictureManifest:
+    """ Lazily loaded manifest, reloaded when the file changes on disk. """
+
+    def __init__(self, out_dir, check_interval=0):
+        self.path = os.path.join(out_dir, MANIFEST)
+        self.check_interval = check_interval
+        self.checked_at = None
+        self.mtime = None
+        self.entries = {}
+        self.digest = ""
+
+    def refresh(self):
+        """ Reload a changed manifest; returns its digest, '' if there is none. """
+        # Every picture on a page asks; stat the file at most once an interval.
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.check_interval:
+            return self.digest
+        self.checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            self.mtime, self.entries, self.digest = None, {}, ""
+            return ""
+        if mtime != self.mtime:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            self.entries = json.loads(data)
+            self.digest = hashlib.sha1(data).hexdigest()
+            self.mtime = mtime
+        return self.digest
+
+    def get(self, picture):
+        self.refresh()
+        return self.entries.get(picture)
+
+
+def init_images(app):
+    manifest = PictureManifest(
+        os.path.join(app.static_folder, DERIVED_DIR),
+        app.config["IMAGE_MANIFEST_CHECK_INTERVAL"],
+    )
+    app.extensions["picture_manifest"] = manifest
+    max_age = app.config["IMAGE_CACHE_MAX_AGE"]
+
+    @app.template_global()
+    def picture_sources(picture):
+        """ srcset strings for a dish picture, or None if it has no derivatives. """
+        entry = manifest.get(picture)
+        if entry is None:
+            return None
+        sources = {
+            name: ", ".join(
+                f"{url_for('static', filename=f'{DERIVED_DIR}/{filename}')} {width}w"
+                for width, filename in variants
+            )
+            for name, variants in entry["variants"].items()
+        }
+        smallest = entry["variants"]["jpeg"][0][1]
+        sources["src"] = url_for("static", filename=f"{DERIVED_DIR}/{smallest}")
+        return sources
+
+    @app.after_request
+    def cache_derived_pictures(response):
+        filename = (request.view_args or {}).get("filename", "")
+        if request.endpoint == "static" and filename.startswith(DERIVED_DIR + "/"):
+            if not filename.endswith(MANIFEST):
+                response.cache_control.no_cache = None
+                response.cache_control.public = True
+                response.cache_control.max_age = max_age
+                response.cache_control.immutable = True
+        return response
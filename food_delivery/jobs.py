@@ -0,0 +1,179 @@
+import json
+import os
+import random
+import signal
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from food_delivery.models import db, Job, Order
+
+HANDLERS = {}
+
+
+def job_handler(kind):
+    """ Register a function that processes jobs of the given kind. """
+
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def enqueue(kind, payload=None, key=None, delay=0, max_attempts=None):
+    """ Add a job to the session; it is committed with the caller's transaction. """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    if key is not None and db.session.query(Job.id).filter_by(key=key).first():
+        return None
+    now = datetime.utcnow()
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        key=key,
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts or current_app.config["JOB_MAX_ATTEMPTS"],
+        run_at=now + timedelta(seconds=delay),
+        created_at=now,
+    )
+    db.session.add(job)
+    return job
+
+
+def backoff(attempts, base, cap):
+    """ Exponential backoff with jitter for the given number of failed attempts. """
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1)
+
+
+def claimable(now, lock_timeout):
+    stale = now - timedelta(seconds=lock_timeout)
+    return or_(
+        and_(Job.status == "queued", Job.run_at <= now),
+        and_(Job.status == "running", Job.locked_at < stale),
+    )
+
+
+def claim_job(worker_id):
+    """ Lock the next due job for this worker, or return None if there is none. """
+    now = datetime.utcnow()
+    condition = claimable(now, current_app.config["JOB_LOCK_TIMEOUT"])
+    candidates = (
+        db.session.query(Job.id).filter(condition).order_by(Job.run_at).limit(10).all()
+    )
+    for (job_id,) in candidates:
+        claimed = Job.query.filter(Job.id == job_id, condition).update(
+            {
+                "status": "running",
+                "locked_at": now,
+                "locked_by": worker_id,
+                "attempts": Job.attempts + 1,
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        if claimed:
+            return Job.query.get(job_id)
+    return None
+
+
+def fail_job(job, error):
+    config = current_app.config
+    job.last_error = error
+    job.locked_at = job.locked_by = None
+    if job.attempts >= job.max_attempts:
+        job.status = "failed"
+        job.finished_at = datetime.utcnow()
+        current_app.logger.error("Job %r failed permanently:\n%s", job, error)
+    else:
+        job.status = "queued"
+        delay = backoff(
+            job.attempts, config["JOB_BACKOFF_BASE"], config["JOB_BACKOFF_MAX"]
+        )
+        job.run_at = datetime.utcnow() + timedelta(seconds=delay)
+        current_app.logger.warning("Job %r failed, retrying in %.0fs", job, delay)
+    db.session.commit()
+
+
+def run_job(job):
+    """ Run a claimed job; the handler's writes are committed together with its status. """
+    if job.attempts > job.max_attempts:
+        return fail_job(job, "Lock timed out on the last attempt")
+
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler for job kind {job.kind!r}")
+        handler(json.loads(job.payload))
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        job.locked_at = job.locked_by = job.last_error = None
+        db.session.commit()
+    except Exception:
+        error = traceback.format_exc()
+        db.session.rollback()
+        fail_job(job, error)
+
+
+def work(app, worker_id, stop, burst):
+    poll_interval = app.config["JOB_POLL_INTERVAL"]
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                job = claim_job(worker_id)
+                if job is not None:
+                    run_job(job)
+            except Exception:
+                app.logger.exception("Worker %s could not process jobs", worker_id)
+                db.session.rollback()
+                job = None
+        if job is None:
+            if burst:
+                return
+            stop.wait(poll_interval)
+
+
+def run_worker(app, concurrency=1, burst=False):
+    """ Process jobs in worker threads until SIGINT/SIGTERM, or until idle in burst mode. """
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [
+        threading.Thread(
+            target=work, args=(app, f"{prefix}:{i}", stop, burst), name=f"worker-{i}"
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+    for thread in threads:
+        thread.join()
+
+
+@job_handler("order_placed")
+def order_placed(payload):
+    """ Send the order confirmation and the kitchen ticket. """
+    order = Order.query.profile("admin_orders").get(payload["order_id"])
+    if order is None:
+        return
+    lines = ", ".join(map(repr, order.lines))
+    current_app.logger.info(
+        "Order #%s for %s: %s, total %s ₽, deliver to %s",
+        order.id,
+        order.user,
+        lines,
+        order.total,
+        order.address,
+    )
@@ -0,0 +1,227 @@
+import signal
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, column, func, select, update
+
+from food_delivery.models import db, Dish, Order, OrderLine
+from food_delivery.stats import move_orders
+
+orders_table = Order.__table__
+# ChoiceType is not hashable for the statement cache, so refer to the bare column.
+status = column("status")
+
+
+def slot_start(moment, slot):
+    """ Start of the kitchen slot containing moment. """
+    epoch = datetime(2000, 1, 1)
+    return moment - (moment - epoch) % slot
+
+
+class KitchenPlan:
+    """ Per-dish portions booked in each slot, kept in step with orders.kitchen_slot. """
+
+    def __init__(self, slot, default_capacity):
+        self.slot = slot
+        self.default_capacity = default_capacity
+        self.capacities = {}
+        self.load = defaultdict(int)
+        self.orders = {}
+        # Per dish, a slot before which it has no free capacity.
+        self.first_open = {}
+
+    def capacity(self, dish_id):
+        return self.capacities.get(dish_id) or self.default_capacity
+
+    def fits(self, start, lines):
+        for dish_id, qty in lines:
+            booked = self.load.get((start, dish_id), 0)
+            # An order bigger than a whole batch still gets an empty slot.
+            if booked and booked + qty > self.capacity(dish_id):
+                return False
+        return True
+
+    def book(self, order_id, start, lines):
+        for dish_id, qty in lines:
+            self.load[start, dish_id] += qty
+        self.orders[order_id] = start, lines
+
+    def assign(self, order_id, lines, earliest):
+        """ Book the order into the first slot where all its dishes fit. """
+        start = max(
+            [earliest]
+            + [self.first_open.get(dish_id, earliest) for dish_id, _ in lines]
+        )
+        while not self.fits(start, lines):
+            start += self.slot
+        self.book(order_id, start, lines)
+        for dish_id, _ in lines:
+            if self.first_open.get(dish_id, earliest) == start and (
+                self.load[start, dish_id] >= self.capacity(dish_id)
+            ):
+                self.first_open[dish_id] = start + self.slot
+        return start
+
+    def release(self, order_id):
+        start, lines = self.orders.pop(order_id)
+        for dish_id, qty in lines:
+            key = start, dish_id
+            self.load[key] -= qty
+            if self.load[key] <= 0:
+                del self.load[key]
+            if self.first_open.get(dish_id, start) > start:
+                self.first_open[dish_id] = start
+
+
+class KitchenScheduler:
+    """ Plans pending orders into slots and advances their statuses on each tick. """
+
+    def __init__(self, slot_minutes, default_capacity):
+        self.slot = timedelta(minutes=slot_minutes)
+        self.plan = KitchenPlan(self.slot, default_capacity)
+
+    def pending_lines(self, order_ids):
+        lines = defaultdict(list)
+        rows = db.session.execute(
+            select(
+                OrderLine.order_id,
+                OrderLine.dish_id,
+                OrderLine.qty,
+                Dish.kitchen_capacity,
+            )
+            .join(Dish, Dish.id == OrderLine.dish_id)
+            .where(OrderLine.order_id.in_(order_ids))
+        )
+        for order_id, dish_id, qty, capacity in rows:
+            lines[order_id].append((dish_id, qty))
+            if self.plan.capacities.get(dish_id) != capacity:
+                self.plan.capacities[dish_id] = capacity
+                self.plan.first_open.pop(dish_id, None)
+        return lines
+
+    def sync(self, now):
+        """ Book orders that are new to the plan and drop those no longer pending. """
+        pending = dict(
+            db.session.execute(
+                select(orders_table.c.id, orders_table.c.kitchen_slot).where(
+                    status.in_(["New", "Processing"])
+                )
+            ).all()
+        )
+        for order_id in self.plan.orders.keys() - pending.keys():
+            self.plan.release(order_id)
+
+        missing = sorted(pending.keys() - self.plan.orders.keys())
+        earliest = slot_start(now, self.slot)
+        slots = {}
+        for chunk in range(0, len(missing), 1000):
+            order_ids = missing[chunk : chunk + 1000]
+            lines = self.pending_lines(order_ids)
+            for order_id in order_ids:
+                start = pending[order_id]
+                if start is not None:
+                    self.plan.book(order_id, start, lines[order_id])
+                else:
+                    slots[order_id] = self.plan.assign(
+                        order_id, lines[order_id], earliest
+                    )
+
+        if slots:
+            db.session.execute(
+                update(orders_table)
+                .where(orders_table.c.id == bindparam("b_id"))
+                .values(kitchen_slot=bindparam("b_slot")),
+                [{"b_id": key, "b_slot": value} for key, value in slots.items()],
+            )
+        return len(slots)
+
+    def advance(self, now):
+        """ Start batches whose slot has begun and finish those whose slot is over. """
+        started = db.session.execute(
+            update(orders_table)
+            .where(status == "New", orders_table.c.kitchen_slot <= now)
+            .values(status="Processing")
+        ).rowcount
+        move_orders("New", "Processing", started)
+
+        done_before = now - self.slot
+        completed = db.session.execute(
+            update(orders_table)
+            .where(status == "Processing", orders_table.c.kitchen_slot <= done_before)
+            .values(status="Completed")
+        ).rowcount
+        move_orders("Processing", "Completed", completed)
+
+        for order_id, (start, _) in list(self.plan.orders.items()):
+            if start <= done_before:
+                self.plan.release(order_id)
+        return started, completed
+
+    def tick(self, now=None):
+        now = now or datetime.utcnow()
+        try:
+            planned = self.sync(now)
+            started, completed = self.advance(now)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return planned, started, completed
+
+
+def kitchen_plan(default_capacity):
+    """ Batches of the current plan: one row per slot and dish. """
+    qty = func.sum(OrderLine.qty)
+    return db.session.execute(
+        select(
+            orders_table.c.kitchen_slot,
+            Dish.title,
+            func.coalesce(Dish.kitchen_capacity, default_capacity),
+            func.count(OrderLine.order_id),
+            qty,
+        )
+        .select_from(orders_table)
+        .join(OrderLine, OrderLine.order_id == orders_table.c.id)
+        .join(Dish, Dish.id == OrderLine.dish_id)
+        .where(
+            status.in_(["New", "Processing"]), orders_table.c.kitchen_slot.isnot(None)
+        )
+        .group_by(
+            orders_table.c.kitchen_slot, Dish.id, Dish.title, Dish.kitchen_capacity
+        )
+        .order_by(orders_table.c.kitchen_slot, qty.desc())
+    ).all()
+
+
+def run_kitchen(app, interval, once=False):
+    """ Replan and advance orders every interval seconds until SIGINT/SIGTERM. """
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    scheduler = KitchenScheduler(
+        app.config["KITCHEN_SLOT_MINUTES"], app.config["KITCHEN_CAPACITY"]
+    )
+    try:
+        while not stop.is_set():
+            with app.app_context():
+                started_at = time.perf_counter()
+                try:
+                    planned, started, completed = scheduler.tick()
+                except Exception:
+                    app.logger.exception("Kitchen tick failed")
+                else:
+                    app.logger.info(
+                        "Kitchen tick: %s planned, %s started, %s completed, "
+                        "%s pending in %.0f ms",
+                        planned,
+                        started,
+                        completed,
+                        len(scheduler.plan.orders),
+                        (time.perf_counter() - started_at) * 1000,
+                    )
+            if once:
+                return
+            stop.wait(interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,166 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from food_delivery.models import db, CacheVersion, Category, Dish
+
+MenuDish = namedtuple("MenuDish", ["id", "title", "price", "description", "picture"])
+MenuCategory = namedtuple("MenuCategory", ["id", "title", "dishes"])
+MenuSnapshot = namedtuple(
+    "MenuSnapshot", ["version", "built_at", "digest", "categories", "dishes"]
+)
+
+
+def snapshot_query():
+    return (
+        db.session.query(
+            Category.id,
+            Category.title,
+            Dish.id,
+            Dish.title,
+            Dish.price,
+            Dish.description,
+            Dish.picture,
+        )
+        .outerjoin(Category.dishes)
+        .order_by(Category.id, Dish.id)
+    )
+
+
+def build_snapshot(version):
+    """ Load the whole catalog with a single query. """
+    rows = snapshot_query()
+
+    categories = []
+    dishes = {}
+    current_id, current_title, current_dishes = None, None, []
+    for category_id, category_title, dish_id, *dish_fields in rows:
+        if category_id != current_id:
+            if current_id is not None:
+                categories.append(
+                    MenuCategory(current_id, current_title, tuple(current_dishes))
+                )
+            current_id, current_title, current_dishes = category_id, category_title, []
+        if dish_id is not None:
+            dish = dishes.setdefault(dish_id, MenuDish(dish_id, *dish_fields))
+            current_dishes.append(dish)
+    if current_id is not None:
+        categories.append(
+            MenuCategory(current_id, current_title, tuple(current_dishes))
+        )
+
+    categories = tuple(categories)
+    return MenuSnapshot(
+        version=version,
+        built_at=time.monotonic(),
+        digest=hashlib.sha1(repr(categories).encode()).hexdigest(),
+        categories=categories,
+        dishes=MappingProxyType(dishes),
+    )
+
+
+def shared_version(name):
+    table = CacheVersion.__table__
+    with db.engine.connect() as conn:
+        return (
+            conn.execute(
+                db.select(table.c.version).where(table.c.name == name)
+            ).scalar()
+            or 0
+        )
+
+
+def bump_shared_version(name):
+    """ Increment the version every worker polls and return the new value. """
+    table = CacheVersion.__table__
+    with db.engine.begin() as conn:
+        updated = conn.execute(
+            table.update()
+            .where(table.c.name == name)
+            .values(version=table.c.version + 1)
+        )
+        if not updated.rowcount:
+            try:
+                with conn.begin_nested():
+                    conn.execute(table.insert().values(name=name, version=1))
+            except IntegrityError:
+                conn.execute(
+                    table.update()
+                    .where(table.c.name == name)
+                    .values(version=table.c.version + 1)
+                )
+        return conn.execute(
+            db.select(table.c.version).where(table.c.name == name)
+        ).scalar()
+
+
+class MenuCache:
+    """ Per-process catalog snapshot, invalidated by a shared version bump or TTL. """
+
+    def __init__(self):
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self._snapshot = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        """ Pick up bumps from other workers, polling at most once an interval. """
+        interval = current_app.config["MENU_VERSION_CHECK_INTERVAL"]
+        checked_at = self._checked_at
+        if checked_at is not None and time.monotonic() - checked_at < interval:
+            return
+        with self._lock:
+            checked_at = self._checked_at
+            if checked_at is None or time.monotonic() - checked_at >= interval:
+                self.version = shared_version("menu")
+                self._checked_at = time.monotonic()
+
+    def _is_fresh(self, snapshot):
+        return (
+            snapshot is not None
+            and snapshot.version == self.version
+            and time.monotonic() - snapshot.built_at
+            < current_app.config["MENU_CACHE_TTL"]
+        )
+
+    def get(self):
+        self._check_version()
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            with self._lock:
+                self.hits += 1
+            return snapshot
+
+        with self._lock:
+            self.misses += 1
+            snapshot = self._snapshot
+            if not self._is_fresh(snapshot):
+                snapshot = build_snapshot(self.version)
+                self._snapshot = snapshot
+                self.rebuilds += 1
+        return snapshot
+
+    def invalidate(self):
+        version = bump_shared_version("menu")
+        with self._lock:
+            self.version = version
+            self._checked_at = time.monotonic()
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+        }
+
+
+menu_cache = MenuCache()
@@ -0,0 +1,255 @@
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import (
+    Response,
+    abort,
+    g,
+    has_request_context,
+    request,
+    before_render_template,
+    template_rendered,
+)
+from sqlalchemy import event
+
+from food_delivery.menu import menu_cache
+from food_delivery.models import db
+from food_delivery.pool_stats import pool_stats
+
+INF = float("inf")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, INF)
+SIZE_BUCKETS = (1000, 5000, 20000, 50000, 100000, 500000, 1000000, INF)
+RENDER_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, INF)
+BUCKETS = {
+    "http_request_duration_seconds": LATENCY_BUCKETS,
+    "http_response_size_bytes": SIZE_BUCKETS,
+    "template_render_seconds": RENDER_BUCKETS,
+}
+HELP = {
+    "http_request_duration_seconds": "Request latency by endpoint.",
+    "http_response_size_bytes": "Response body size by endpoint.",
+    "template_render_seconds": "Jinja render time by template.",
+    "db_statements_total": "SQL statements executed by endpoint.",
+    "db_statement_seconds_total": "Time spent in SQL statements by endpoint.",
+    "menu_cache_events_total": "Menu snapshot cache events.",
+    "db_pool_events_total": "Connection pool events.",
+    "db_pool_checkout_seconds_total": "Time spent waiting for pool checkouts.",
+}
+
+
+class Metrics:
+    """ Process-local counters and histograms, optionally dumped to METRICS_DIR. """
+
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self.counters[name, labels] += value
+
+    def observe(self, name, labels, value):
+        bounds = BUCKETS[name]
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[name, labels] = [0] * len(bounds) + [0, 0]
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = [
+                [name, list(labels), list(values)]
+                for (name, labels), values in self.histograms.items()
+            ]
+        for event_name, value in menu_cache.stats().items():
+            if event_name != "version":
+                counters["menu_cache_events_total", (("event", event_name),)] = value
+        for event_name in ("checkouts", "timeouts", "overflow_checkouts", "connects"):
+            value = getattr(pool_stats, event_name)
+            counters["db_pool_events_total", (("event", event_name),)] = value
+        counters["db_pool_checkout_seconds_total", ()] = pool_stats.checkout_seconds
+        return {
+            "counters": [
+                [name, list(labels), value]
+                for (name, labels), value in counters.items()
+            ],
+            "histograms": histograms,
+        }
+
+    def dump(self, directory):
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + ".tmp", path)
+
+
+metrics = Metrics()
+
+
+def merge_snapshots(snapshots):
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, values in snapshot["histograms"]:
+            key = name, tuple(map(tuple, labels))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+            else:
+                histograms[key] = values
+    return counters, histograms
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def render_text(counters, histograms):
+    """ Render merged metrics in the Prometheus text exposition format. """
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{format_labels(labels)} {value:g}")
+
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS[name], values):
+                cumulative += count
+                le = "+Inf" if bound == INF else repr(float(bound))
+                lines.append(
+                    f"{name}_bucket{format_labels(labels, [('le', le)])} {cumulative}"
+                )
+            lines.append(f"{name}_sum{format_labels(labels)} {values[-2]:g}")
+            lines.append(f"{name}_count{format_labels(labels)} {values[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def collect(directory):
+    if not directory:
+        return merge_snapshots([metrics.snapshot()])
+    metrics.dump(directory)
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return merge_snapshots(snapshots)
+
+
+def endpoint_labels():
+    return (("endpoint", request.endpoint or "none"),)
+
+
+def init_metrics(app):
+    directory = app.config["METRICS_DIR"]
+    flush_interval = app.config["METRICS_FLUSH_INTERVAL"]
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    last_flush = [time.monotonic()]
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        labels = endpoint_labels()
+        metrics.observe(
+            "http_request_duration_seconds",
+            labels + (("method", request.method),),
+            time.perf_counter() - started,
+        )
+        size = response.content_length or response.calculate_content_length()
+        if size is not None:
+            metrics.observe("http_response_size_bytes", labels, size)
+
+        if directory and time.monotonic() - last_flush[0] > flush_interval:
+            last_flush[0] = time.monotonic()
+            metrics.dump(directory)
+        return response
+
+    engine = db.get_engine(app)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["statement_started"].pop()
+        if has_request_context():
+            labels = endpoint_labels()
+        else:
+            labels = (("endpoint", "none"),)
+        metrics.inc("db_statements_total", labels)
+        metrics.inc("db_statement_seconds_total", labels, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def discard_statement(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("statement_started"):
+            connection.info["statement_started"].pop()
+
+    @before_render_template.connect_via(app)
+    def start_render(sender, template, context, **extra):
+        g.setdefault("render_started", []).append(time.perf_counter())
+
+    @template_rendered.connect_via(app)
+    def record_render(sender, template, context, **extra):
+        started = g.render_started.pop()
+        metrics.observe(
+            "template_render_seconds",
+            (("template", template.name),),
+            time.perf_counter() - started,
+        )
+
+    @app.route("/metrics")
+    def metrics_view():
+        # Labels reveal endpoints and traffic, so only the scraper may read them.
+        token = app.config["METRICS_TOKEN"]
+        if not token:
+            abort(404)
+        authorization = request.headers.get("Authorization", "").encode()
+        if not hmac.compare_digest(authorization, f"Bearer {token}".encode()):
+            return Response(
+                "Unauthorized\n", 401, {"WWW-Authenticate": 'Bearer realm="metrics"'}
+            )
+        counters, histograms = collect(directory)
+        return Response(
+            render_text(counters, histograms),
+            mimetype="text/plain; version=0.0.4",
+        )
@@ -0,0 +1,27 @@
+"""kitchen slots on orders and per-dish capacity
+
+Revision ID: 1f6d8b3e9a52
+Revises: e5a9c3170d6b
+Create Date: 2026-10-18 18:03:51.207114
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '1f6d8b3e9a52'
+down_revision = 'e5a9c3170d6b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('dishes', sa.Column('kitchen_capacity', sa.Integer(), nullable=True))
+    op.add_column('orders', sa.Column('kitchen_slot', sa.DateTime(), nullable=True))
+    op.create_index('ix_orders_status_kitchen_slot', 'orders', ['status', 'kitchen_slot'])
+
+
+def downgrade():
+    op.drop_index('ix_orders_status_kitchen_slot', table_name='orders')
+    op.drop_column('orders', 'kitchen_slot')
+    op.drop_column('dishes', 'kitchen_capacity')
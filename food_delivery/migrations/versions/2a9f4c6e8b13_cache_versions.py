@@ -0,0 +1,28 @@
+"""shared cache versions
+
+Revision ID: 2a9f4c6e8b13
+Revises: 7c2e5f18d9a4
+Create Date: 2026-10-19 10:12:05.318204
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2a9f4c6e8b13'
+down_revision = '7c2e5f18d9a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table = op.create_table('cache_versions',
+                            sa.Column('name', sa.String(length=32), nullable=False),
+                            sa.Column('version', sa.Integer(), nullable=False),
+                            sa.PrimaryKeyConstraint('name')
+                            )
+    op.bulk_insert(table, [{'name': 'menu', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('cache_versions')
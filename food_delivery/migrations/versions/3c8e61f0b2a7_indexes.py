@@ -0,0 +1,59 @@
+"""association primary keys and lookup indexes
+
+Revision ID: 3c8e61f0b2a7
+Revises: 5b0e2c7a91d4
+Create Date: 2026-10-18 12:26:04.118305
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '3c8e61f0b2a7'
+down_revision = '5b0e2c7a91d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('categories_dishes_new',
+                    sa.Column('category_id', sa.Integer(), nullable=False),
+                    sa.Column('dish_id', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+                    sa.ForeignKeyConstraint(['dish_id'], ['dishes.id'], ),
+                    sa.PrimaryKeyConstraint('category_id', 'dish_id', name='categories_dishes_pkey')
+                    )
+    op.execute(
+        "INSERT INTO categories_dishes_new (category_id, dish_id) "
+        "SELECT DISTINCT category_id, dish_id FROM categories_dishes "
+        "WHERE category_id IS NOT NULL AND dish_id IS NOT NULL"
+    )
+    op.drop_table('categories_dishes')
+    op.rename_table('categories_dishes_new', 'categories_dishes')
+    op.create_index('ix_categories_dishes_dish_id', 'categories_dishes', ['dish_id'])
+
+    op.create_index('ix_order_lines_dish_id', 'order_lines', ['dish_id'])
+    op.create_index('ix_orders_date', 'orders', ['date'])
+    op.create_index('ix_orders_status', 'orders', ['status'])
+    op.create_index('ix_orders_user_id_date', 'orders', ['user_id', sa.text('date DESC')])
+
+
+def downgrade():
+    op.drop_index('ix_orders_user_id_date', table_name='orders')
+    op.drop_index('ix_orders_status', table_name='orders')
+    op.drop_index('ix_orders_date', table_name='orders')
+    op.drop_index('ix_order_lines_dish_id', table_name='order_lines')
+
+    op.drop_index('ix_categories_dishes_dish_id', table_name='categories_dishes')
+    op.create_table('categories_dishes_old',
+                    sa.Column('category_id', sa.Integer(), nullable=True),
+                    sa.Column('dish_id', sa.Integer(), nullable=True),
+                    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+                    sa.ForeignKeyConstraint(['dish_id'], ['dishes.id'], )
+                    )
+    op.execute(
+        "INSERT INTO categories_dishes_old (category_id, dish_id) "
+        "SELECT category_id, dish_id FROM categories_dishes"
+    )
+    op.drop_table('categories_dishes')
+    op.rename_table('categories_dishes_old', 'categories_dishes')
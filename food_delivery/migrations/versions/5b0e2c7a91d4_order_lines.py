@@ -0,0 +1,55 @@
+"""order lines with quantity and price snapshot
+
+Revision ID: 5b0e2c7a91d4
+Revises: f146409c0616
+Create Date: 2026-10-18 11:03:17.520941
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5b0e2c7a91d4'
+down_revision = 'f146409c0616'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_lines',
+                    sa.Column('order_id', sa.Integer(), nullable=False),
+                    sa.Column('dish_id', sa.Integer(), nullable=False),
+                    sa.Column('qty', sa.Integer(), nullable=False),
+                    sa.Column('unit_price', sa.Integer(), nullable=False),
+                    sa.Column('title', sa.String(), nullable=False),
+                    sa.ForeignKeyConstraint(['dish_id'], ['dishes.id'], ),
+                    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+                    sa.PrimaryKeyConstraint('order_id', 'dish_id')
+                    )
+    op.execute(
+        "INSERT INTO order_lines (order_id, dish_id, qty, unit_price, title) "
+        "SELECT od.order_id, od.dish_id, COUNT(*), COALESCE(d.price, 0), d.title "
+        "FROM orders_dishes od JOIN dishes d ON d.id = od.dish_id "
+        "WHERE od.order_id IS NOT NULL "
+        "GROUP BY od.order_id, od.dish_id, d.price, d.title"
+    )
+    op.drop_table('orders_dishes')
+
+
+def downgrade():
+    op.create_table('orders_dishes',
+                    sa.Column('order_id', sa.Integer(), nullable=True),
+                    sa.Column('dish_id', sa.Integer(), nullable=True),
+                    sa.ForeignKeyConstraint(['dish_id'], ['dishes.id'], ),
+                    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], )
+                    )
+    # The association had one row per portion; repeat each line qty times.
+    op.execute(
+        "INSERT INTO orders_dishes (order_id, dish_id) "
+        "WITH RECURSIVE portions (order_id, dish_id, n) AS ("
+        "SELECT order_id, dish_id, qty FROM order_lines WHERE qty > 0 "
+        "UNION ALL "
+        "SELECT order_id, dish_id, n - 1 FROM portions WHERE n > 1"
+        ") SELECT order_id, dish_id FROM portions"
+    )
+    op.drop_table('order_lines')
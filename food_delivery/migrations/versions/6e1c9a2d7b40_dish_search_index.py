@@ -0,0 +1,30 @@
+"""full-text search index over dishes (PostgreSQL only)
+
+Revision ID: 6e1c9a2d7b40
+Revises: d27b5e4a1f93
+Create Date: 2026-10-18 15:31:06.219874
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '6e1c9a2d7b40'
+down_revision = 'd27b5e4a1f93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(
+        "CREATE INDEX ix_dishes_search ON dishes USING gin (("
+        "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('russian', coalesce(description, '')), 'B')))"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_dishes_search', table_name='dishes')
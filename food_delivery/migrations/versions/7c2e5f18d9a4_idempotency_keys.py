@@ -0,0 +1,35 @@
+"""idempotency keys for checkout
+
+Revision ID: 7c2e5f18d9a4
+Revises: 1f6d8b3e9a52
+Create Date: 2026-10-18 19:20:37.640915
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '7c2e5f18d9a4'
+down_revision = '1f6d8b3e9a52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotency_keys',
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('key', sa.String(length=64), nullable=False),
+                    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+                    sa.Column('status_code', sa.Integer(), nullable=False),
+                    sa.Column('headers', sa.Text(), nullable=False),
+                    sa.Column('body', sa.LargeBinary(), nullable=False),
+                    sa.Column('created_at', sa.DateTime(), nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+                    sa.PrimaryKeyConstraint('user_id', 'key')
+                    )
+    op.create_index('ix_idempotency_keys_created_at', 'idempotency_keys', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_created_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
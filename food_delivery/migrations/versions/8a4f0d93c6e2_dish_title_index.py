@@ -0,0 +1,22 @@
+"""index dishes by title for seeding upserts
+
+Revision ID: 8a4f0d93c6e2
+Revises: 3c8e61f0b2a7
+Create Date: 2026-10-18 13:41:52.803316
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8a4f0d93c6e2'
+down_revision = '3c8e61f0b2a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_dishes_title', 'dishes', ['title'])
+
+
+def downgrade():
+    op.drop_index('ix_dishes_title', table_name='dishes')
@@ -0,0 +1,43 @@
+"""order rollup tables for the admin dashboard
+
+Revision ID: b4f7e2c95a18
+Revises: 6e1c9a2d7b40
+Create Date: 2026-10-18 16:05:44.871203
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b4f7e2c95a18'
+down_revision = '6e1c9a2d7b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_stats_daily',
+                    sa.Column('day', sa.Date(), nullable=False),
+                    sa.Column('orders', sa.Integer(), nullable=False),
+                    sa.Column('revenue', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('day')
+                    )
+    op.create_table('order_stats_dishes',
+                    sa.Column('dish_id', sa.Integer(), nullable=False),
+                    sa.Column('orders', sa.Integer(), nullable=False),
+                    sa.Column('qty', sa.Integer(), nullable=False),
+                    sa.Column('revenue', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['dish_id'], ['dishes.id'], ),
+                    sa.PrimaryKeyConstraint('dish_id')
+                    )
+    op.create_table('order_stats_statuses',
+                    sa.Column('status', sa.String(), nullable=False),
+                    sa.Column('orders', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('status')
+                    )
+
+
+def downgrade():
+    op.drop_table('order_stats_statuses')
+    op.drop_table('order_stats_dishes')
+    op.drop_table('order_stats_daily')
@@ -0,0 +1,41 @@
+"""background jobs queue
+
+Revision ID: d27b5e4a1f93
+Revises: 8a4f0d93c6e2
+Create Date: 2026-10-18 15:02:17.448109
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd27b5e4a1f93'
+down_revision = '8a4f0d93c6e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('jobs',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('kind', sa.String(length=50), nullable=False),
+                    sa.Column('payload', sa.Text(), nullable=False),
+                    sa.Column('key', sa.String(), nullable=True),
+                    sa.Column('status', sa.String(length=10), nullable=False),
+                    sa.Column('attempts', sa.Integer(), nullable=False),
+                    sa.Column('max_attempts', sa.Integer(), nullable=False),
+                    sa.Column('run_at', sa.DateTime(), nullable=False),
+                    sa.Column('locked_at', sa.DateTime(), nullable=True),
+                    sa.Column('locked_by', sa.String(length=64), nullable=True),
+                    sa.Column('last_error', sa.Text(), nullable=True),
+                    sa.Column('created_at', sa.DateTime(), nullable=False),
+                    sa.Column('finished_at', sa.DateTime(), nullable=True),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('key')
+                    )
+    op.create_index('ix_jobs_status_run_at', 'jobs', ['status', 'run_at'])
+
+
+def downgrade():
+    op.drop_index('ix_jobs_status_run_at', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,25 @@
+"""delivery zone on orders
+
+Revision ID: e5a9c3170d6b
+Revises: b4f7e2c95a18
+Create Date: 2026-10-18 17:12:08.415730
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3170d6b'
+down_revision = 'b4f7e2c95a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('orders', sa.Column('zone', sa.String(length=50), nullable=True))
+    op.create_index('ix_orders_zone_status', 'orders', ['zone', 'status'])
+
+
+def downgrade():
+    op.drop_index('ix_orders_zone_status', table_name='orders')
+    op.drop_column('orders', 'zone')
@@ -0,0 +1,28 @@
+"""server-side carts
+
+Revision ID: f146409c0616
+Revises: 9d8d5786f63c
+Create Date: 2026-10-18 10:12:41.204317
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f146409c0616'
+down_revision = '9d8d5786f63c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('carts',
+                    sa.Column('id', sa.String(length=32), nullable=False),
+                    sa.Column('data', sa.Text(), nullable=False),
+                    sa.Column('updated_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+
+
+def downgrade():
+    op.drop_table('carts')
@@ -1,21 +1,27 @@
 from flask_login import UserMixin
-from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy import SQLAlchemy, BaseQuery
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy_utils import ChoiceType
-from werkzeug.security import generate_password_hash, check_password_hash
 
-db = SQLAlchemy()
+from food_delivery.passwords import password_hasher
+
+
+class ProfiledQuery(BaseQuery):
+    def profile(self, name):
+        """ Apply a named set of loader options from LOADER_PROFILES. """
+        return self.options(*LOADER_PROFILES[name])
+
+
+db = SQLAlchemy(query_class=ProfiledQuery)
 
 categories_dishes_association = db.Table(
     "categories_dishes",
-    db.Column("category_id", db.Integer, db.ForeignKey("categories.id")),
-    db.Column("dish_id", db.Integer, db.ForeignKey("dishes.id")),
-)
-
-orders_dishes_association = db.Table(
-    "orders_dishes",
-    db.Column("order_id", db.Integer, db.ForeignKey("orders.id")),
-    db.Column("dish_id", db.Integer, db.ForeignKey("dishes.id")),
+    db.Column(
+        "category_id", db.Integer, db.ForeignKey("categories.id"), primary_key=True
+    ),
+    db.Column("dish_id", db.Integer, db.ForeignKey("dishes.id"), primary_key=True),
+    db.Index("ix_categories_dishes_dish_id", "dish_id"),
 )
 
 
@@ -35,10 +41,16 @@ class User(UserMixin, db.Model):
 
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher().hash(password)
 
     def password_valid(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher().verify(self.password_hash, password)
+
+    def rehash_password(self, password):
+        """ Re-hash a just-verified password if the hashing policy has changed. """
+        if password_hasher().needs_rehash(self.password_hash):
+            self.password = password
+            db.session.commit()
 
     def save(self):
         db.session.add(self)
@@ -53,15 +65,16 @@ class Dish(db.Model):
     __tablename__ = "dishes"
 
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String, nullable=False)
+    title = db.Column(db.String, nullable=False, index=True)
     price = db.Column(db.Integer)
     description = db.Column(db.Text)
     picture = db.Column(db.String)
+    kitchen_capacity = db.Column(db.Integer)
     categories = db.relationship(
         "Category", secondary=categories_dishes_association, back_populates="dishes"
     )
     orders = db.relationship(
-        "Order", secondary=orders_dishes_association, back_populates="dishes"
+        "Order", secondary="order_lines", back_populates="dishes", viewonly=True
     )
 
     def __repr__(self):
@@ -92,13 +105,20 @@ class Order(db.Model):
     __tablename__ = "orders"
 
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.DateTime, default=func.now(), nullable=False)
+    date = db.Column(db.DateTime, default=func.now(), nullable=False, index=True)
     total = db.Column(db.Integer, nullable=False)
-    status = db.Column(ChoiceType(OrderStatusType), nullable=False, default="New")
+    status = db.Column(
+        ChoiceType(OrderStatusType), nullable=False, default="New", index=True
+    )
     phone = db.Column(db.String(15), nullable=False)
     address = db.Column(db.String, nullable=False)
+    zone = db.Column(db.String(50))
+    kitchen_slot = db.Column(db.DateTime)
+    lines = db.relationship(
+        "OrderLine", back_populates="order", cascade="all, delete-orphan"
+    )
     dishes = db.relationship(
-        "Dish", secondary=orders_dishes_association, back_populates="orders"
+        "Dish", secondary="order_lines", back_populates="orders", viewonly=True
     )
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
     user = db.relationship("User", back_populates="orders")
@@ -110,3 +130,110 @@ class Order(db.Model):
 
     def __repr__(self):
         return str(self.id)
+
+
+db.Index("ix_orders_user_id_date", Order.user_id, Order.date.desc())
+db.Index("ix_orders_zone_status", Order.zone, Order.status)
+db.Index("ix_orders_status_kitchen_slot", Order.status, Order.kitchen_slot)
+
+
+class OrderLine(db.Model):
+    __tablename__ = "order_lines"
+
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), primary_key=True)
+    dish_id = db.Column(
+        db.Integer, db.ForeignKey("dishes.id"), primary_key=True, index=True
+    )
+    qty = db.Column(db.Integer, nullable=False, default=1)
+    unit_price = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String, nullable=False)
+    order = db.relationship("Order", back_populates="lines")
+
+    @property
+    def amount(self):
+        return self.qty * self.unit_price
+
+    def __repr__(self):
+        return f"{self.title} × {self.qty}"
+
+
+class Cart(db.Model):
+    __tablename__ = "carts"
+
+    id = db.Column(db.String(32), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+class CacheVersion(db.Model):
+    __tablename__ = "cache_versions"
+
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_keys"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    key = db.Column(db.String(64), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    headers = db.Column(db.Text, nullable=False)
+    body = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default="{}")
+    key = db.Column(db.String, unique=True)
+    status = db.Column(db.String(10), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_at = db.Column(db.DateTime)
+    locked_by = db.Column(db.String(64))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"{self.kind} #{self.id}"
+
+
+db.Index("ix_jobs_status_run_at", Job.status, Job.run_at)
+
+
+order_stats_daily = db.Table(
+    "order_stats_daily",
+    db.Column("day", db.Date, primary_key=True),
+    db.Column("orders", db.Integer, nullable=False, default=0),
+    db.Column("revenue", db.Integer, nullable=False, default=0),
+)
+
+order_stats_dishes = db.Table(
+    "order_stats_dishes",
+    db.Column("dish_id", db.Integer, db.ForeignKey("dishes.id"), primary_key=True),
+    db.Column("orders", db.Integer, nullable=False, default=0),
+    db.Column("qty", db.Integer, nullable=False, default=0),
+    db.Column("revenue", db.Integer, nullable=False, default=0),
+)
+
+order_stats_statuses = db.Table(
+    "order_stats_statuses",
+    db.Column("status", db.String, primary_key=True),
+    db.Column("orders", db.Integer, nullable=False, default=0),
+)
+
+
+LOADER_PROFILES = {
+    "account_orders": (selectinload(Order.lines),),
+    "admin_users": (selectinload(User.orders),),
+    "admin_dishes": (selectinload(Dish.categories),),
+    "admin_categories": (selectinload(Category.dishes),),
+    "admin_orders": (joinedload(Order.user), selectinload(Order.lines)),
+}
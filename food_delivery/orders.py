@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from food_delivery.models import Order
+
+
+def encode_cursor(order):
+    return f"{order.date.isoformat()}_{order.id}"
+
+
+def decode_cursor(cursor):
+    """ Return (date, id) from a cursor or None if it is malformed. """
+    date, _, order_id = cursor.rpartition("_")
+    try:
+        return datetime.fromisoformat(date), int(order_id)
+    except ValueError:
+        return None
+
+
+def order_history(user_id, page_size, before=None):
+    """ Return a page of orders, newest first, and the cursor of the next page. """
+    query = Order.query.profile("account_orders").filter(Order.user_id == user_id)
+    if before is not None:
+        query = query.filter(tuple_(Order.date, Order.id) < before)
+    orders = (
+        query.order_by(Order.date.desc(), Order.id.desc()).limit(page_size + 1).all()
+    )
+
+    next_cursor = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_cursor = encode_cursor(orders[-1])
+    return orders, next_cursor
@@ -0,0 +1,91 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHashingBusy(Exception):
+    code = 503
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """ Caps concurrent KDF runs per process; the request thread does the hashing. """
+
+    def __init__(self, method, workers, queue_size, timeout):
+        self.method = method
+        self.timeout = timeout
+        # At most `workers` hashes run at once and `queue_size` more wait for a turn.
+        self._admitted = threading.BoundedSemaphore(workers + queue_size)
+        self._running = threading.BoundedSemaphore(workers)
+
+    def _busy(self):
+        return PasswordHashingBusy(
+            "Too many password hashes in flight", math.ceil(self.timeout) or 1
+        )
+
+    def _run(self, func, *args):
+        if not self._admitted.acquire(blocking=False):
+            raise self._busy()
+        try:
+            if not self._running.acquire(timeout=self.timeout):
+                raise self._busy()
+            try:
+                return func(*args)
+            finally:
+                self._running.release()
+        finally:
+            self._admitted.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split("$", 1)[0] != self.method
+
+
+def hash_method(config):
+    return f"{config['PASSWORD_HASH_ALGORITHM']}:{config['PASSWORD_HASH_ITERATIONS']}"
+
+
+def password_hasher():
+    return current_app.extensions["password_hasher"]
+
+
+def init_passwords(app):
+    config = app.config
+    app.extensions["password_hasher"] = PasswordHasher(
+        hash_method(config),
+        config["PASSWORD_HASH_WORKERS"],
+        config["PASSWORD_HASH_QUEUE"],
+        config["PASSWORD_HASH_TIMEOUT"],
+    )
+
+
+def time_hashes(method, rounds, concurrency):
+    """ Hash with the given method on concurrent threads and print the latencies. """
+    from food_delivery.bench import percentile
+
+    def timed_hash(i):
+        started = time.perf_counter()
+        generate_password_hash(f"benchmark-{i}", method)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        timings = sorted(executor.map(timed_hash, range(rounds)))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{method}: p50 {percentile(timings, 0.5) * 1000:.1f} ms, "
+        f"p99 {percentile(timings, 0.99) * 1000:.1f} ms, "
+        f"{rounds / elapsed:.1f} hashes/s with {concurrency} threads"
+    )
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+
+class PoolStats:
+    """ Connection pool counters shared by all engines of the process. """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkout_seconds = 0.0
+        self.checkout_max_seconds = 0.0
+        self.checkout_buckets = [0] * len(CHECKOUT_BUCKETS)
+        self.timeouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.overflow_checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkout_seconds += seconds
+            self.checkout_max_seconds = max(self.checkout_max_seconds, seconds)
+            for i, bound in enumerate(CHECKOUT_BUCKETS):
+                if seconds <= bound:
+                    self.checkout_buckets[i] += 1
+                    break
+
+    def record_checkout(self, overflow):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.overflow_checkouts += overflow
+
+    def increment(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_checkin(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_seconds": round(self.checkout_seconds, 6),
+                "checkout_max_seconds": round(self.checkout_max_seconds, 6),
+                "checkout_buckets": dict(
+                    zip(map(str, CHECKOUT_BUCKETS), self.checkout_buckets)
+                ),
+                "timeouts": self.timeouts,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "overflow_checkouts": self.overflow_checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """ QueuePool that records how long callers wait for a connection. """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except TimeoutError:
+            pool_stats.increment("timeouts")
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+
+
+def init_pool_stats(engine):
+    pool = engine.pool
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        current = engine.pool
+        overflow = isinstance(current, QueuePool) and current.overflow() > 0
+        pool_stats.record_checkout(overflow)
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        pool_stats.record_checkin()
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_stats.increment("connects")
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_stats.increment("invalidations")
+
+
+def pool_status(engine):
+    status = pool_stats.as_dict()
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return status
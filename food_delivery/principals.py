@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+
+from food_delivery.models import db, User
+
+
+class Principal:
+    """ The logged-in user as Flask-Login sees it, without an ORM instance. """
+
+    __slots__ = ("id", "name", "email", "is_admin")
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, name, email, is_admin):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.is_admin = is_admin
+
+    def get_id(self):
+        return str(self.id)
+
+    def __repr__(self):
+        return self.email
+
+
+class PrincipalCache:
+    """ Per-process LRU of principals by user id, entries expire after ttl seconds. """
+
+    def __init__(self, ttl=60, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        row = (
+            db.session.query(User.id, User.name, User.email, User.is_admin)
+            .filter(User.id == user_id)
+            .first()
+        )
+        if row is None:
+            return None
+        principal = Principal(*row)
+        with self._lock:
+            self._entries[user_id] = now + self.ttl, principal
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+principal_cache = PrincipalCache()
+
+
+def init_principals(app):
+    principal_cache.ttl = app.config["USER_CACHE_TTL"]
+    principal_cache.max_size = app.config["USER_CACHE_SIZE"]
@@ -0,0 +1,33 @@
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from food_delivery.models import db
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get("query_count", 0) + 1
+
+
+def init_query_budget(app):
+    """ Count SQL statements per request and enforce SQLALCHEMY_QUERY_BUDGET. """
+    budget = app.config["SQLALCHEMY_QUERY_BUDGET"]
+    if not (app.debug or budget):
+        return
+
+    event.listen(db.get_engine(app), "before_cursor_execute", count_statement)
+
+    @app.after_request
+    def check_query_budget(response):
+        count = g.get("query_count", 0)
+        response.headers["X-Query-Count"] = str(count)
+        if budget and count > budget:
+            message = f"{request.endpoint} issued {count} queries, budget is {budget}"
+            if app.config["SQLALCHEMY_QUERY_BUDGET_STRICT"]:
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        return response
@@ -0,0 +1,106 @@
+import re
+import sys
+
+from sqlalchemy import column
+
+from food_delivery.menu import snapshot_query
+from food_delivery.models import (
+    db,
+    Order,
+    OrderLine,
+    categories_dishes_association,
+)
+
+FULL_SCAN = {
+    "sqlite": re.compile(r"^SCAN (?:TABLE )?(\w+)(?!.*USING)"),
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+}
+
+
+def plan_checks():
+    """ Main view queries and the tables each of them must reach through an index. """
+    return [
+        (
+            "account orders",
+            Order.query.filter(Order.user_id == 1)
+            .order_by(Order.date.desc(), Order.id.desc())
+            .limit(10),
+            ["orders"],
+        ),
+        (
+            "order lines",
+            OrderLine.query.filter(OrderLine.order_id.in_([1, 2, 3])),
+            ["order_lines"],
+        ),
+        (
+            "dish order lines",
+            OrderLine.query.filter(OrderLine.dish_id == 1),
+            ["order_lines"],
+        ),
+        (
+            "admin orders by status",
+            # Compare the plain column; Order.status would hash the ChoiceType.
+            Order.query.filter(column("status") == "New"),
+            ["orders"],
+        ),
+        (
+            "admin orders by date",
+            Order.query.order_by(Order.date.desc()).limit(25),
+            ["orders"],
+        ),
+        (
+            "dish categories",
+            db.session.query(categories_dishes_association).filter(
+                categories_dishes_association.c.dish_id.in_([1, 2, 3])
+            ),
+            ["categories_dishes"],
+        ),
+        ("menu snapshot", snapshot_query(), ["dishes"]),
+    ]
+
+
+def explain(conn, query):
+    sql = str(
+        query.statement.compile(
+            dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+    return [row[0] for row in conn.exec_driver_sql("EXPLAIN " + sql)]
+
+
+def full_scans(full_scan, plan, indexed_tables):
+    """ The indexed tables that the plan reads in full, sorted. """
+    scanned = {
+        re.sub(r"_\d+$", "", match.group(1))
+        for line in plan
+        for match in [full_scan.search(line.strip())]
+        if match
+    }
+    return sorted(scanned.intersection(indexed_tables))
+
+
+def check_query_plans():
+    """ EXPLAIN the main view queries and fail on full scans of indexed tables. """
+    failures = 0
+    with db.engine.connect() as conn:
+        full_scan = FULL_SCAN.get(conn.dialect.name)
+        if full_scan is None:
+            sys.exit(f"Error: query plans are not supported for {conn.dialect.name}.")
+        if conn.dialect.name == "postgresql":
+            # Tiny seeded tables are cheaper to scan; make the planner show its indexes.
+            conn.exec_driver_sql("SET enable_seqscan = off")
+
+        for name, query, indexed_tables in plan_checks():
+            plan = explain(conn, query)
+            bad = full_scans(full_scan, plan, indexed_tables)
+            failures += bool(bad)
+            print(f"{'FAIL' if bad else 'ok':4} {name}")
+            for line in plan:
+                print(f"       {line}")
+            if bad:
+                print(f"       full scan of {', '.join(bad)}")
+
+    if failures:
+        sys.exit(f"Error: {failures} queries do not use an index.")
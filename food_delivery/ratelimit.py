@@ -0,0 +1,130 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, request
+from flask_login import current_user
+from werkzeug.exceptions import TooManyRequests
+
+from food_delivery.cart_store import redis_client
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+Limit = namedtuple("Limit", ["capacity", "rate"])
+
+
+def parse_limit(spec):
+    """ '10/minute' or '10/minute burst 20': refill rate and bucket size. """
+    rate, _, burst = spec.partition(" burst ")
+    count, _, period = rate.strip().partition("/")
+    count = int(count)
+    return Limit(capacity=int(burst or count), rate=count / PERIODS[period.strip()])
+
+
+def parse_limits(specs):
+    """ 'main.index_view=60/minute, api.login=10/minute' to {endpoint: Limit}. """
+    limits = {}
+    for item in specs.split(","):
+        if item.strip():
+            endpoint, _, spec = item.partition("=")
+            limits[endpoint.strip()] = parse_limit(spec)
+    return limits
+
+
+def take(state, now, limit):
+    """ Refill the bucket and take one token; returns (state, retry_after). """
+    tokens, updated = state if state is not None else (limit.capacity, now)
+    tokens = min(limit.capacity, tokens + (now - updated) * limit.rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / limit.rate
+
+
+class RateLimiter(ABC):
+    """ Token buckets keyed by client and endpoint. """
+
+    @abstractmethod
+    def hit(self, key, limit):
+        """ Return 0 if the request may proceed, else seconds until it may. """
+
+
+class MemoryRateLimiter(RateLimiter):
+    """ Per-process buckets; each worker enforces the limit on its own. """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit):
+        with self._lock:
+            state, retry_after = take(self._buckets.get(key), time.monotonic(), limit)
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class RedisRateLimiter(RateLimiter):
+    """ Buckets shared by all workers; any client with redis-py's transaction() works. """
+
+    def __init__(self, client, prefix="ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key, limit):
+        key = self.prefix + key
+        result = []
+
+        def update(pipe):
+            data = pipe.get(key)
+            if isinstance(data, bytes):
+                data = data.decode()
+            state = tuple(map(float, data.split(":"))) if data is not None else None
+            (tokens, now), retry_after = take(state, time.time(), limit)
+            pipe.multi()
+            # A bucket left alone this long is full again, so it can expire.
+            ttl = math.ceil(limit.capacity / limit.rate)
+            pipe.set(key, f"{tokens}:{now}", ex=ttl)
+            result[:] = [retry_after]
+
+        self.client.transaction(update, key)
+        return result[0]
+
+
+def create_rate_limiter(config):
+    url = config["RATE_LIMIT_STORE_URL"]
+    if url == "memory":
+        return MemoryRateLimiter(config["RATE_LIMIT_STORE_SIZE"])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisRateLimiter(redis_client(url))
+    raise ValueError(f"Unknown RATE_LIMIT_STORE_URL: {url}")
+
+
+def client_key():
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return f"ip:{request.remote_addr}"
+
+
+def init_rate_limits(app):
+    app.extensions["rate_limiter"] = create_rate_limiter(app.config)
+    limits = parse_limits(app.config["RATE_LIMITS"])
+
+    @app.before_request
+    def check_rate_limit():
+        limit = limits.get(request.endpoint)
+        if (
+            limit is None
+            or request.method in ("GET", "HEAD", "OPTIONS")
+            or not current_app.config["RATE_LIMIT_ENABLED"]
+        ):
+            return
+        retry_after = app.extensions["rate_limiter"].hit(
+            f"{request.endpoint}:{client_key()}", limit
+        )
+        if retry_after:
+            raise TooManyRequests(retry_after=math.ceil(retry_after))
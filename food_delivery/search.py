@@ -0,0 +1,231 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from math import log
+
+from flask import current_app
+from sqlalchemy import bindparam, func, literal_column
+
+from food_delivery.menu import menu_cache
+from food_delivery.models import db, Dish
+
+WORD = re.compile(r"\w+")
+TITLE_WEIGHT = 3
+MAX_PREFIX_TERMS = 50
+# Must stay identical to the ix_dishes_search expression so Postgres can use it.
+TSVECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B')"
+)
+
+VOWELS = "аеиоуыэюя"
+RV = re.compile(rf"^(.*?[{VOWELS}])(.*)$")
+PERFECTIVE_GERUND = re.compile(
+    r"((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$"
+)
+REFLEXIVE = re.compile(r"(с[яь])$")
+ADJECTIVE = re.compile(
+    r"(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$"
+)
+PARTICIPLE = re.compile(r"((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$")
+VERB = re.compile(
+    r"((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют"
+    r"|ит|ыт|ены|ить|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны"
+    r"|ть|ешь|нно)))$"
+)
+NOUN = re.compile(
+    r"(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах"
+    r"|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$"
+)
+DERIVATIONAL = re.compile(rf".*[^{VOWELS}]+[{VOWELS}].*ость?$")
+DERIVATIONAL_SUFFIX = re.compile(r"ость?$")
+SUPERLATIVE = re.compile(r"(ейше|ейш)$")
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """ Porter stemmer for Russian; other words are returned unchanged. """
+    match = RV.match(word)
+    if not match:
+        return word
+    start, rv = match.groups()
+
+    stripped = PERFECTIVE_GERUND.sub("", rv, 1)
+    if stripped == rv:
+        rv = REFLEXIVE.sub("", rv, 1)
+        stripped = ADJECTIVE.sub("", rv, 1)
+        if stripped != rv:
+            rv = PARTICIPLE.sub("", stripped, 1)
+        else:
+            stripped = VERB.sub("", rv, 1)
+            rv = NOUN.sub("", rv, 1) if stripped == rv else stripped
+    else:
+        rv = stripped
+
+    if rv.endswith("и"):
+        rv = rv[:-1]
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_SUFFIX.sub("", rv, 1)
+    if rv.endswith("ь"):
+        rv = rv[:-1]
+    else:
+        rv = SUPERLATIVE.sub("", rv, 1)
+        if rv.endswith("нн"):
+            rv = rv[:-1]
+    return start + rv
+
+
+def tokenize(text):
+    return WORD.findall((text or "").lower().replace("ё", "е"))
+
+
+def analyze(text):
+    return [stem(word) for word in tokenize(text)]
+
+
+class SearchIndex:
+    """ Inverted index over menu dishes, patched from the diff of menu snapshots. """
+
+    def __init__(self):
+        self.snapshot = None
+        self.dishes = {}
+        self.weights = {}
+        self.postings = {}
+        self.vocabulary = []
+        self._lock = threading.Lock()
+
+    def sync(self, menu):
+        if self.snapshot is menu:
+            return
+        with self._lock:
+            if self.snapshot is menu:
+                return
+            changed = [
+                dish
+                for dish_id, dish in menu.dishes.items()
+                if self.dishes.get(dish_id) != dish
+            ]
+            removed = [dish_id for dish_id in self.dishes if dish_id not in menu.dishes]
+            # Searches running while the postings are patched may hit either old or
+            # new dish ids, so they resolve against both until the patch is done.
+            self.dishes = {**self.dishes, **menu.dishes}
+            for dish_id in removed:
+                self._remove(dish_id)
+            for dish in changed:
+                self._remove(dish.id)
+                self._add(dish)
+            if changed or removed:
+                self.vocabulary = sorted(self.postings)
+            self.dishes = dict(menu.dishes)
+            self.snapshot = menu
+
+    def _add(self, dish):
+        weights = Counter()
+        for term in analyze(dish.title):
+            weights[term] += TITLE_WEIGHT
+        for term in analyze(dish.description):
+            weights[term] += 1
+        self.weights[dish.id] = weights
+        # Postings are replaced rather than mutated so concurrent searches stay consistent.
+        for term, weight in weights.items():
+            self.postings[term] = {**self.postings.get(term, {}), dish.id: weight}
+
+    def _remove(self, dish_id):
+        for term in self.weights.pop(dish_id, ()):
+            postings = dict(self.postings[term])
+            del postings[dish_id]
+            if postings:
+                self.postings[term] = postings
+            else:
+                del self.postings[term]
+
+    def expand(self, prefix):
+        vocabulary = self.vocabulary
+        i = bisect_left(vocabulary, prefix)
+        terms = []
+        while i < len(vocabulary) and len(terms) < MAX_PREFIX_TERMS:
+            if not vocabulary[i].startswith(prefix):
+                break
+            terms.append(vocabulary[i])
+            i += 1
+        return terms
+
+    def search(self, query, limit=20, prefix=False):
+        """ Dishes matching every query term, best tf-idf score first. """
+        terms = analyze(query)
+        if not terms:
+            return []
+        dishes = self.dishes
+        scores = None
+        for i, term in enumerate(terms):
+            expanded = self.expand(term) if prefix and i == len(terms) - 1 else [term]
+            term_scores = {}
+            for candidate in expanded:
+                postings = self.postings.get(candidate, {})
+                idf = log(1 + len(dishes) / len(postings)) if postings else 0
+                for dish_id, weight in postings.items():
+                    term_scores[dish_id] = max(
+                        term_scores.get(dish_id, 0), weight * idf
+                    )
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    dish_id: score + term_scores[dish_id]
+                    for dish_id, score in scores.items()
+                    if dish_id in term_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(
+            (dishes[dish_id] for dish_id in scores if dish_id in dishes),
+            key=lambda dish: (-scores[dish.id], dish.title),
+        )
+        return ranked[:limit]
+
+
+search_index = SearchIndex()
+
+
+def tsquery_text(query, prefix):
+    words = tokenize(query)
+    if prefix and words:
+        words[-1] += ":*"
+    return " & ".join(words)
+
+
+def postgres_search(query, limit, prefix):
+    text = tsquery_text(query, prefix)
+    if not text:
+        return []
+    document = literal_column(f"({TSVECTOR_SQL})")
+    tsquery = func.to_tsquery(literal_column("'russian'"), bindparam("query", text))
+    rank = func.ts_rank(document, tsquery)
+    rows = (
+        db.session.query(Dish.id)
+        .filter(document.op("@@")(tsquery))
+        .order_by(rank.desc(), Dish.title)
+        .limit(limit)
+    )
+    return [dish_id for dish_id, in rows]
+
+
+def use_postgres():
+    backend = current_app.config["SEARCH_BACKEND"]
+    if backend == "auto":
+        return db.engine.dialect.name == "postgresql"
+    return backend == "postgres"
+
+
+def search_dishes(query, limit=20, prefix=False):
+    """ Search the menu with the configured backend; returns MenuDish rows. """
+    query = query[: current_app.config["SEARCH_MAX_QUERY_LENGTH"]]
+    menu = menu_cache.get()
+    if use_postgres():
+        dish_ids = postgres_search(query, limit, prefix)
+        return [menu.dishes[dish_id] for dish_id in dish_ids if dish_id in menu.dishes]
+    search_index.sync(menu)
+    return search_index.search(query, limit, prefix)
@@ -1,39 +1,114 @@
 import csv
 import sys
+import time
+from itertools import islice
 
-from food_delivery.models import db, Category, Dish
+from food_delivery.models import db, Category, Dish, categories_dishes_association
 
+CATEGORIES_CSV = "./db-seed-data/delivery_categories.csv"
+DISHES_CSV = "./db-seed-data/delivery_items.csv"
 
-def load_data_from_csv(filename):
+
+def iter_csv_rows(filename):
     try:
         with open(filename, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            data = []
-            for row in reader:
-                data.append(row)
+            yield from csv.DictReader(f)
     except FileNotFoundError:
-        sys.exit("Error: CSV file is not found.")
-    else:
-        return data
+        sys.exit(f"Error: CSV file {filename} is not found.")
 
 
-def seed():
-    """ Add seed data to the database. """
-    categories = load_data_from_csv("./db-seed-data/delivery_categories.csv")
-    dishes = load_data_from_csv("./db-seed-data/delivery_items.csv")
-
-    for c in categories:
-        db.session.add(Category(title=c["title"]))
-    db.session.commit()
-
-    for d in dishes:
-        dish = Dish(
-            title=d["title"],
-            price=d["price"],
-            description=d["description"],
-            picture=d["picture"],
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def upsert_categories(rows, dry_run):
+    """ Insert missing categories and map CSV category ids to database ids. """
+    rows = list(rows)
+    existing = dict(db.session.query(Category.title, Category.id))
+    missing = [{"title": row["title"]} for row in rows if row["title"] not in existing]
+    if missing and not dry_run:
+        db.session.execute(Category.__table__.insert(), missing)
+        existing = dict(db.session.query(Category.title, Category.id))
+    return {row["id"]: existing.get(row["title"]) for row in rows}
+
+
+def upsert_dishes(chunk, category_ids, dry_run):
+    """ Insert or update one chunk of dishes keyed on title. Returns (new, updated). """
+    rows = {}
+    for row in chunk:
+        rows[row["title"]] = row
+
+    existing = dict(db.session.query(Dish.title, Dish.id).filter(Dish.title.in_(rows)))
+    values = {
+        title: {
+            "title": title,
+            "price": int(row["price"]) if row["price"] else None,
+            "description": row["description"],
+            "picture": row["picture"],
+        }
+        for title, row in rows.items()
+    }
+    new = [values[title] for title in rows if title not in existing]
+    updated = [dict(values[title], id=existing[title]) for title in existing]
+    if dry_run:
+        return len(new), len(updated)
+
+    if new:
+        db.session.execute(Dish.__table__.insert(), new)
+    if updated:
+        db.session.bulk_update_mappings(Dish, updated)
+    dish_ids = dict(db.session.query(Dish.title, Dish.id).filter(Dish.title.in_(rows)))
+
+    links = set()
+    for title, row in rows.items():
+        for category_id in row["category_id"].split(";"):
+            db_category_id = category_ids.get(category_id.strip())
+            if db_category_id is not None:
+                links.add((db_category_id, dish_ids[title]))
+    db.session.execute(
+        categories_dishes_association.delete().where(
+            categories_dishes_association.c.dish_id.in_(dish_ids.values())
+        )
+    )
+    if links:
+        db.session.execute(
+            categories_dishes_association.insert(),
+            [{"category_id": c, "dish_id": d} for c, d in links],
         )
-        c = Category.query.filter(Category.id == d["category_id"]).one()
-        dish.categories.append(c)
-        db.session.add(dish)
-    db.session.commit()
+    return len(new), len(updated)
+
+
+def seed(
+    chunk_size=1000,
+    dry_run=False,
+    categories_csv=CATEGORIES_CSV,
+    dishes_csv=DISHES_CSV,
+):
+    """ Add seed data to the database. """
+    started = time.perf_counter()
+    category_ids = upsert_categories(iter_csv_rows(categories_csv), dry_run)
+    if not dry_run:
+        db.session.commit()
+
+    total_new = total_updated = 0
+    for chunk in chunked(iter_csv_rows(dishes_csv), chunk_size):
+        new, updated = upsert_dishes(chunk, category_ids, dry_run)
+        total_new += new
+        total_updated += updated
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    rows = total_new + total_updated
+    print(
+        f"{'Checked' if dry_run else 'Seeded'} {rows} dishes "
+        f"({total_new} new, {total_updated} updated) in {elapsed:.2f}s, "
+        f"{rows / elapsed if elapsed else 0:.0f} rows/s"
+    )
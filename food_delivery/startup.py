@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict, namedtuple
+
+Import = namedtuple("Import", ["module", "self_us", "cumulative_us", "depth"])
+ImportProfile = namedtuple(
+    "ImportProfile", ["imports", "import_ms", "create_app_ms", "max_rss_mb"]
+)
+
+# Runs in a fresh interpreter; prints seconds to import, seconds in create_app, KB RSS.
+SCRIPT = """
+import resource, time
+started = time.perf_counter()
+from food_delivery import create_app, preload
+imported = time.perf_counter()
+app = create_app()
+if {preload}:
+    preload(app)
+print(imported - started, time.perf_counter() - imported,
+      resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def parse_importtime(lines):
+    """ Rows of python -X importtime output, in the order they were printed. """
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append(Import(name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def profile_imports(preload=False):
+    """ Import the package and build the app in a child process under -X importtime. """
+    env = dict(os.environ)
+    # Profile what a web worker imports, not what the flask command adds.
+    env.pop("FLASK_RUN_FROM_CLI", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT.format(preload=preload)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_s, create_app_s, max_rss_kb = result.stdout.split()[-3:]
+    return ImportProfile(
+        imports=parse_importtime(result.stderr.splitlines()),
+        import_ms=float(import_s) * 1000,
+        create_app_ms=float(create_app_s) * 1000,
+        max_rss_mb=int(max_rss_kb) / 1024,
+    )
+
+
+def package_totals(imports):
+    """ Self time and module count per top-level package, slowest first. """
+    totals = defaultdict(lambda: [0, 0])
+    for item in imports:
+        total = totals[item.module.partition(".")[0]]
+        total[0] += item.self_us
+        total[1] += 1
+    return sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+
+
+def print_import_profile(profile, top):
+    imports = profile.imports
+    print(
+        f"{len(imports)} modules imported in {profile.import_ms:.0f} ms "
+        f"(with -X importtime overhead), create_app() {profile.create_app_ms:.0f} ms, "
+        f"max RSS {profile.max_rss_mb:.1f} MB"
+    )
+    slowest = sorted(imports, key=lambda item: item.cumulative_us, reverse=True)
+    print("\nSlowest imports, cumulative ms / self ms:")
+    for item in slowest[:top]:
+        print(
+            f"{item.cumulative_us / 1000:9.1f} {item.self_us / 1000:8.1f}  "
+            f"{'  ' * item.depth}{item.module}"
+        )
+    print("\nPackages by self ms:")
+    for package, (self_us, count) in package_totals(imports)[:top]:
+        print(f"{self_us / 1000:9.1f}  {package} ({count} modules)")
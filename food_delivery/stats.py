@@ -0,0 +1,153 @@
+from datetime import date, timedelta
+
+from sqlalchemy import column, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+
+from food_delivery.models import (
+    db,
+    Dish,
+    Order,
+    OrderLine,
+    OrderStatusType,
+    order_stats_daily,
+    order_stats_dishes,
+    order_stats_statuses,
+)
+
+
+def bump(table, key, **deltas):
+    """ Add deltas to the rollup row for key, creating it on first use. """
+    where = [table.c[column] == value for column, value in key.items()]
+    update = (
+        table.update()
+        .where(*where)
+        .values({column: table.c[column] + delta for column, delta in deltas.items()})
+    )
+    if db.session.execute(update).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert().values(**key, **deltas))
+    except IntegrityError:
+        db.session.execute(update)
+
+
+def status_code(status):
+    return getattr(status, "code", status)
+
+
+def count_order(day, total, status, sign=1):
+    bump(order_stats_daily, {"day": day}, orders=sign, revenue=sign * total)
+    bump(order_stats_statuses, {"status": status_code(status)}, orders=sign)
+
+
+def count_lines(lines, sign=1):
+    for dish_id, qty, unit_price in lines:
+        bump(
+            order_stats_dishes,
+            {"dish_id": dish_id},
+            orders=sign,
+            qty=sign * qty,
+            revenue=sign * qty * unit_price,
+        )
+
+
+def record_order(order, lines):
+    """ Add a new order to the rollups in the caller's transaction. """
+    count_order(order.date.date(), order.total, order.status)
+    count_lines(lines)
+
+
+def record_order_change(order, is_created):
+    """ Move an order edited in the admin between rollup rows. """
+    if is_created:
+        db.session.flush()
+        return count_order(order.date.date(), order.total, order.status)
+
+    state = inspect(order)
+    old = {}
+    for name in ("date", "total", "status"):
+        history = state.attrs[name].history
+        old[name] = history.deleted[0] if history.deleted else getattr(order, name)
+    if (old["date"].date(), old["total"], status_code(old["status"])) != (
+        order.date.date(),
+        order.total,
+        status_code(order.status),
+    ):
+        count_order(old["date"].date(), old["total"], old["status"], sign=-1)
+        count_order(order.date.date(), order.total, order.status)
+
+
+def move_orders(old_status, new_status, count):
+    """ Account for a bulk status change of count orders. """
+    if count:
+        bump(order_stats_statuses, {"status": old_status}, orders=-count)
+        bump(order_stats_statuses, {"status": new_status}, orders=count)
+
+
+def forget_order(order):
+    count_order(order.date.date(), order.total, order.status, sign=-1)
+    count_lines(
+        ((line.dish_id, line.qty, line.unit_price) for line in order.lines), sign=-1
+    )
+
+
+def backfill():
+    """ Rebuild every rollup table from orders and order lines. """
+    day = func.date(Order.date)
+    db.session.execute(order_stats_daily.delete())
+    db.session.execute(
+        order_stats_daily.insert().from_select(
+            ["day", "orders", "revenue"],
+            select(day, func.count(), func.sum(Order.total)).group_by(day),
+        )
+    )
+    # ChoiceType is not hashable for the statement cache, so refer to the bare column.
+    status = column("status")
+    db.session.execute(order_stats_statuses.delete())
+    db.session.execute(
+        order_stats_statuses.insert().from_select(
+            ["status", "orders"],
+            select(status, func.count()).select_from(Order.__table__).group_by(status),
+        )
+    )
+    db.session.execute(order_stats_dishes.delete())
+    db.session.execute(
+        order_stats_dishes.insert().from_select(
+            ["dish_id", "orders", "qty", "revenue"],
+            select(
+                OrderLine.dish_id,
+                func.count(),
+                func.sum(OrderLine.qty),
+                func.sum(OrderLine.qty * OrderLine.unit_price),
+            ).group_by(OrderLine.dish_id),
+        )
+    )
+    db.session.commit()
+
+
+def dashboard(days):
+    """ Rollup rows for the analytics page. """
+    since = date.today() - timedelta(days=days - 1)
+    daily = db.session.execute(
+        select(order_stats_daily)
+        .where(order_stats_daily.c.day >= since)
+        .order_by(order_stats_daily.c.day.desc())
+    ).all()
+    top_dishes = db.session.execute(
+        select(
+            Dish.title,
+            order_stats_dishes.c.orders,
+            order_stats_dishes.c.qty,
+            order_stats_dishes.c.revenue,
+        )
+        .join(Dish, Dish.id == order_stats_dishes.c.dish_id)
+        .order_by(order_stats_dishes.c.revenue.desc())
+        .limit(20)
+    ).all()
+    labels = dict(OrderStatusType)
+    statuses = [
+        (labels.get(status, status), orders)
+        for status, orders in db.session.execute(select(order_stats_statuses))
+    ]
+    return daily, top_dishes, statuses
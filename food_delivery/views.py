@@ -1,13 +1,17 @@
+from urllib.parse import urljoin, urlparse
+
 from flask import (
+    Blueprint,
+    current_app,
     render_template,
     redirect,
     url_for,
     request,
-    session,
     flash,
     abort,
+    jsonify,
+    make_response,
 )
-from flask_admin.helpers import is_safe_url
 from flask_login import (
     login_user,
     logout_user,
@@ -15,89 +19,213 @@ from flask_login import (
     current_user,
 )
 
-from food_delivery import app
+from food_delivery.cart import (
+    get_or_create_cart,
+    save_cart,
+    clear_cart,
+    drop_stale_lines,
+    set_quantity,
+    cart_lines,
+    cart_total,
+    place_order,
+)
+from food_delivery.catalog import catalog_etag, render_catalog
+from food_delivery.delivery import quote_address
 from food_delivery.forms import LoginForm, RegistrationForm, OrderForm
-from food_delivery.models import User, Dish, Order, Category
+from food_delivery.idempotency import new_key, replay_response, request_key, run_once
+from food_delivery.menu import menu_cache
+from food_delivery.models import db, User
+from food_delivery.orders import decode_cursor, order_history
+from food_delivery.passwords import PasswordHashingBusy
+from food_delivery.pool_stats import pool_status
+from food_delivery.search import search_dishes
+
+main = Blueprint("main", __name__)
+
+
+def is_safe_url(target):
+    """ Only redirect to pages of this site after logging in. """
+    # Browsers read backslashes as slashes, so '\\evil.com' is another host.
+    url = urlparse(urljoin(request.host_url, target.strip().replace("\\", "/")))
+    host = urlparse(request.host_url).netloc
+    return url.scheme in ("http", "https") and url.netloc == host
 
 
-@app.before_request
+@main.before_app_request
 def admin_access():
     if "admin" in request.url:
         if not (current_user.is_authenticated and current_user.is_admin):
-            return redirect(url_for("login_view"))
+            return redirect(url_for("main.login_view"))
 
 
-def get_or_create_cart():
-    return session.get("cart", {"items": {}, "total": 0})
+def change_cart_quantity(delta, must_exist=True):
+    """ Add delta to a cart line; delta=0 removes the line. """
+    dish_id = request.form.get("dish_id", type=int)
+    menu = menu_cache.get()
+    if must_exist and dish_id not in menu.dishes:
+        abort(404)
+    cart = get_or_create_cart()
+    qty = cart["items"].get(str(dish_id), 0) + delta if delta else 0
+    set_quantity(cart, dish_id, qty, menu.dishes)
+    save_cart(cart)
 
 
-@app.route("/", methods=["GET", "POST"])
+@main.route("/", methods=["GET", "POST"])
 def index_view():
-    categories = Category.query.all()
-
     if request.method == "POST":
-        cart = get_or_create_cart()
-        dish_id = request.form.get("dish_id")
-        dish_price = Dish.query.get(dish_id).price
-        if dish_id not in cart.get("items"):
-            cart.get("items")[dish_id] = dish_price
-            cart["total"] = sum(item_price for item_price in cart["items"].values())
-            session["cart"] = cart
-            return redirect(url_for("index_view"))
-    return render_template("main.html", categories=categories)
-
-
-@app.route("/cart/", methods=["GET", "POST"])
+        change_cart_quantity(1)
+        return redirect(url_for(".index_view"))
+
+    menu = menu_cache.get()
+    cart = get_or_create_cart()
+    etag = catalog_etag(menu, cart)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(
+            render_template("main.html", catalog=render_catalog(menu, cart))
+        )
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response
+
+
+@main.route("/cart/", methods=["GET", "POST"])
 def cart_view():
     cart = get_or_create_cart()
-    cart_items = [Dish.query.get(item_id) for item_id in cart.get("items")]
+    lines = cart_lines(cart)
+    stale = drop_stale_lines(cart, lines)
+    if stale:
+        flash("Некоторых блюд больше нет в меню, мы убрали их из корзины", "warning")
 
     form = OrderForm()
+    submitted = form.validate_on_submit()
+    key = request_key(form.idempotency_key.data)
+
+    # A retried checkout finds the cart already empty, so replay before anything else.
+    if submitted and key and current_user.is_authenticated:
+        replayed = replay_response(current_user.id, key)
+        if replayed is not None:
+            return replayed
+
+    # Let the user see the cart without the dropped dishes before ordering it.
+    if submitted and lines and not stale:
+        if not current_user.is_authenticated:
+            return current_app.login_manager.unauthorized()
+        quote = quote_address(form.address.data)
+        if quote.located and quote.zone is None:
+            form.address.errors.append("Мы не доставляем по этому адресу")
+        else:
 
-    if form.validate_on_submit() and cart_items:
-        user = User.query.get_or_404(current_user.id)
-        order = Order(
-            phone=form.phone.data,
-            address=form.address.data,
-            total=cart.get("total"),
-            user_id=user.id,
-        )
-        order.dishes = [Dish.query.get_or_404(item_id) for item_id in cart.get("items")]
-        order.save()
-        session.pop("cart", None)
-        return redirect(url_for("ordered_view"))
+            def checkout():
+                place_order(
+                    current_user.id,
+                    form.phone.data,
+                    form.address.data,
+                    lines,
+                    quote.zone,
+                )
+                return redirect(url_for(".ordered_view"))
+
+            response = run_once(current_user.id, key, checkout)
+            clear_cart()
+            if quote.eta is not None:
+                flash(f"Доставим примерно через {quote.eta} мин.", "success")
+            return response
 
-    return render_template("cart.html", form=form, cart=cart_items)
+    if not form.idempotency_key.data:
+        form.idempotency_key.data = new_key()
+    return render_template("cart.html", form=form, cart=lines, total=cart_total(lines))
 
 
-@app.route("/delete-from-cart/", methods=["POST"])
+@main.route("/cart/increment/", methods=["POST"])
+def cart_increment_view():
+    change_cart_quantity(1)
+    return redirect(url_for(".cart_view"))
+
+
+@main.route("/cart/decrement/", methods=["POST"])
+def cart_decrement_view():
+    change_cart_quantity(-1, must_exist=False)
+    return redirect(url_for(".cart_view"))
+
+
+@main.route("/delete-from-cart/", methods=["POST"])
 def delete_from_cart_view():
-    dish_id = int(request.form.get("dish_id"))
-    cart = get_or_create_cart()
-    cart.get("items").pop(str(dish_id))
-    cart["total"] = sum(item_price for item_price in cart["items"].values())
-    session["cart"] = cart
+    change_cart_quantity(0, must_exist=False)
     flash("Блюдо удалено из корзины", "warning")
-    return redirect(url_for("cart_view"))
+    return redirect(url_for(".cart_view"))
 
 
-@app.route("/ordered/")
+@main.route("/search/")
+def search_view():
+    query = request.args.get("q", "").strip()
+    page_size = current_app.config["SEARCH_PAGE_SIZE"]
+    dishes = search_dishes(query, page_size) if query else []
+    return render_template("search.html", query=query, dishes=dishes)
+
+
+@main.route("/search/suggest/")
+def search_suggest_view():
+    query = request.args.get("q", "").strip()
+    page_size = current_app.config["SEARCH_SUGGEST_SIZE"]
+    dishes = search_dishes(query, page_size, prefix=True)
+    response = jsonify(
+        [{"id": dish.id, "title": dish.title, "price": dish.price} for dish in dishes]
+    )
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    return response
+
+
+@main.route("/delivery/quote/")
+def delivery_quote_view():
+    quote = quote_address(request.args.get("address", "")[:200])
+    return jsonify(
+        {
+            "deliverable": quote.zone is not None or not quote.located,
+            "zone": quote.zone,
+            "eta": quote.eta,
+        }
+    )
+
+
+@main.route("/admin/menu-cache/")
+def menu_cache_stats_view():
+    return jsonify(menu_cache.stats())
+
+
+@main.route("/admin/db-pool/")
+def db_pool_stats_view():
+    return jsonify(pool_status(db.engine))
+
+
+@main.route("/ordered/")
 @login_required
 def ordered_view():
     return render_template("ordered.html")
 
 
-@app.route("/account/")
+@main.route("/account/")
 @login_required
 def account_view():
-    orders = User.query.get_or_404(current_user.id).orders
-    return render_template("account.html", orders=orders)
+    before = request.args.get("before")
+    if before is not None:
+        before = decode_cursor(before)
+        if before is None:
+            abort(404)
+    orders, next_cursor = order_history(
+        current_user.id, current_app.config["ACCOUNT_ORDERS_PAGE_SIZE"], before
+    )
+    return render_template("account.html", orders=orders, next_cursor=next_cursor)
 
 
-@app.route("/login/", methods=["GET", "POST"])
+@main.route("/login/", methods=["GET", "POST"])
 def login_view():
     if current_user.is_authenticated:
-        return redirect(url_for("account_view"))
+        return redirect(url_for(".account_view"))
 
     form = LoginForm()
 
@@ -111,21 +239,22 @@ def login_view():
         elif not user.password_valid(password):
             form.password.errors.append("Неверный пароль.")
         else:
+            user.rehash_password(password)
             login_user(user)
             if current_user.is_admin:
                 return redirect("/admin")
             next_ = request.args.get("next")
             if next_ and not is_safe_url(next_):
                 return abort(404)
-            return redirect(next_ or url_for("index_view"))
+            return redirect(next_ or url_for(".index_view"))
 
     return render_template("login.html", form=form)
 
 
-@app.route("/register/", methods=["GET", "POST"])
+@main.route("/register/", methods=["GET", "POST"])
 def register_view():
     if current_user.is_authenticated:
-        return redirect(url_for("account_view"))
+        return redirect(url_for(".account_view"))
 
     form = RegistrationForm()
 
@@ -144,19 +273,19 @@ def register_view():
             next_ = request.args.get("next")
             if next_ and not is_safe_url(next_):
                 return abort(404)
-            return redirect(next_ or url_for("account_view"))
+            return redirect(next_ or url_for(".account_view"))
 
     return render_template("register.html", form=form)
 
 
-@app.route("/logout/")
+@main.route("/logout/")
 def logout_view():
     if current_user.is_authenticated:
         logout_user()
-    return redirect(url_for("login_view"))
+    return redirect(url_for(".login_view"))
 
 
-@app.errorhandler(404)
+@main.app_errorhandler(404)
 def page_not_found(error):
     return (
         render_template("error.html", error=error, message="Страница не найдена"),
@@ -164,9 +293,31 @@ def page_not_found(error):
     )
 
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def page_server_error(error):
     return (
         render_template("error.html", error=error, message="Мы уже работаем над этим"),
         500,
     )
+
+
+@main.app_errorhandler(429)
+def too_many_requests(error):
+    return (
+        render_template(
+            "error.html", error=error, message="Слишком много запросов, подождите"
+        ),
+        429,
+        {"Retry-After": str(error.retry_after)},
+    )
+
+
+@main.app_errorhandler(PasswordHashingBusy)
+def password_hashing_busy(error):
+    return (
+        render_template(
+            "error.html", error=error, message="Сервис перегружен, попробуйте позже"
+        ),
+        503,
+        {"Retry-After": str(error.retry_after)},
+    )
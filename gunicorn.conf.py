@@ -0,0 +1,70 @@
+""" Gunicorn settings; every knob can be overridden from the environment. """
+import gc
+import glob
+import multiprocessing
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2, 4)))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 100))
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 0))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+errorlog = "-"
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+
+# Every concurrent request in a worker may hold a connection, so size the pool to match.
+if worker_class == "gthread":
+    os.environ.setdefault("DB_POOL_SIZE", str(threads))
+elif worker_class == "gevent":
+    os.environ.setdefault("DB_POOL_SIZE", str(min(worker_connections, 20)))
+
+
+def on_starting(server):
+    metrics_dir = os.getenv("METRICS_DIR")
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+            os.remove(path)
+
+
+def when_ready(server):
+    if preload_app:
+        from food_delivery import preload
+
+        # Admin views, babel data and templates are loaded once here, not per worker.
+        preload(server.app.wsgi())
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from food_delivery.models import db
+
+        # Workers must not inherit connections opened while preloading.
+        with server.app.wsgi().app_context():
+            db.engine.dispose()
+        # Keep the collector from writing to, and so copying, pages shared with workers.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning("psycogreen is not installed, psycopg2 will block")
+        else:
+            patch_psycopg()
+
+
+def child_exit(server, worker):
+    metrics_dir = os.getenv("METRICS_DIR")
+    if metrics_dir:
+        try:
+            os.remove(os.path.join(metrics_dir, f"{worker.pid}.json"))
+        except FileNotFoundError:
+            pass
@@ -1,3 +1,3 @@
-from food_delivery import app
+from food_delivery import create_app
 
-app.run()
+create_app().run()
@@ -0,0 +1,136 @@
+import os
+import tempfile
+
+# Config reads the environment on import; point it at a throwaway database first.
+DB_DIR = tempfile.mkdtemp(prefix="food-delivery-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'test.db')}"
+os.environ["SECRET_KEY"] = "test"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["PASSWORD_HASH_ITERATIONS"] = "1000"
+for name in ("METRICS_DIR", "METRICS_TOKEN", "CART_STORE_URL", "TRUSTED_PROXY_HOPS"):
+    os.environ.pop(name, None)
+
+import pytest
+from flask_migrate import Migrate, upgrade
+
+from food_delivery import create_app
+from food_delivery.config import Config
+from food_delivery.models import db, User
+
+PACKAGE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "food_delivery"
+)
+MIGRATIONS_DIR = os.path.join(PACKAGE_DIR, "migrations")
+SEED_DIR = os.path.join(PACKAGE_DIR, "db-seed-data")
+EMAIL = "user@example.com"
+PASSWORD = "secret"
+
+
+def build_app(**settings):
+    """ A test app on the shared database, with settings overriding Config. """
+    settings = {"TESTING": True, "WTF_CSRF_ENABLED": False, **settings}
+    return create_app(type("TestConfig", (Config,), settings))
+
+
+class FakeRedis:
+    """ Dict-backed stand-in for the redis-py calls the stores make. """
+
+    def __init__(self):
+        self.now = 0.0
+        self.data = {}
+
+    def get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= self.now:
+            del self.data[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode()
+        self.data[key] = (value, self.now + ex if ex else None)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def ttl(self, key):
+        if self.get(key) is None:
+            return -2
+        expires = self.data[key][1]
+        return -1 if expires is None else expires - self.now
+
+    def transaction(self, func, *watches):
+        pipe = FakePipeline(self)
+        func(pipe)
+        pipe.execute()
+
+
+class FakePipeline:
+    """ Runs calls at once until multi(), then queues them for execute(). """
+
+    def __init__(self, client):
+        self.client = client
+        self.queued = None
+
+    def multi(self):
+        self.queued = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        if self.queued is None:
+            return method
+        return lambda *args, **kwargs: self.queued.append((method, args, kwargs))
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self.queued or []]
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest.fixture(scope="session")
+def app():
+    """ App on a migrated database, seeded from db-seed-data plus one user. """
+    from food_delivery.seeder import seed
+
+    app = build_app()
+    Migrate(app, db, directory=MIGRATIONS_DIR)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIR)
+        seed(
+            categories_csv=os.path.join(SEED_DIR, "delivery_categories.csv"),
+            dishes_csv=os.path.join(SEED_DIR, "delivery_items.csv"),
+        )
+        db.session.add(User(name="user", email=EMAIL, password=PASSWORD))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def migrations_dir():
+    return MIGRATIONS_DIR
+
+
+@pytest.fixture
+def make_app(app):
+    """ Build another app on the seeded database with different settings. """
+    return build_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(app):
+    """ Log a test client in as the seeded user. """
+
+    def login(client):
+        response = client.post("/login/", data={"email": EMAIL, "password": PASSWORD})
+        assert response.status_code == 302
+
+    return login
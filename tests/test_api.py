@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.mark.parametrize("qty", [True, False, 1.0, "1", None, -1, 100])
+def test_cart_item_rejects_bad_quantities(client, qty):
+    response = client.put("/api/v1/cart/items/1/", json={"qty": qty})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "qty must be an integer from 0 to 99"}
+
+
+def test_cart_item_sets_the_quantity(client):
+    response = client.put("/api/v1/cart/items/1/", json={"qty": 3})
+    assert response.status_code == 200
+    assert response.get_json()["count"] == 3
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from food_delivery.cart import CART_COOKIE, get_or_create_cart
+from food_delivery.cart_store import MemoryCartStore, RedisCartStore, SQLCartStore
+from food_delivery.models import db, Cart
+
+TTL = 3600
+CART = {"items": {"1": 2, "3": 1}, "count": 3, "total": 650}
+
+
+@pytest.fixture(params=["memory", "sql", "redis"])
+def store(request, app, fake_redis):
+    if request.param == "memory":
+        yield MemoryCartStore()
+    elif request.param == "sql":
+        with app.app_context():
+            yield SQLCartStore(TTL)
+    else:
+        yield RedisCartStore(fake_redis, TTL)
+
+
+def test_load_unknown_cart(store):
+    assert store.load("missing") is None
+
+
+def test_save_load_and_replace(store):
+    store.save("c1", CART)
+    assert store.load("c1") == CART
+
+    store.save("c1", {"items": {}, "count": 0, "total": 0})
+    assert store.load("c1")["count"] == 0
+
+
+def test_delete(store):
+    store.save("c2", CART)
+    store.delete("c2")
+    assert store.load("c2") is None
+    store.delete("c2")
+
+
+def test_memory_store_drops_least_recently_used():
+    store = MemoryCartStore(max_size=2)
+    store.save("a", CART)
+    store.save("b", CART)
+    store.load("a")
+    store.save("c", CART)
+    assert store.load("b") is None
+    assert store.load("a") == CART
+
+
+def test_redis_store_expires_carts(fake_redis):
+    store = RedisCartStore(fake_redis, TTL)
+    store.save("c3", CART)
+    assert fake_redis.ttl("cart:c3") == TTL
+
+    fake_redis.now += TTL
+    assert store.load("c3") is None
+
+
+def test_sql_store_expires_and_purges_carts(app):
+    with app.app_context():
+        store = SQLCartStore(TTL)
+        store.save("old", CART)
+        store.save("new", CART)
+        Cart.query.filter_by(id="old").update(
+            {"updated_at": datetime.utcnow() - timedelta(seconds=TTL + 1)}
+        )
+        db.session.commit()
+
+        assert store.load("old") is None
+        assert store.purge_expired() == 1
+        assert store.load("new") == CART
+        assert db.session.get(Cart, "old") is None
+
+
+def test_purge_carts_command(app):
+    result = app.test_cli_runner().invoke(args=["purge-carts"])
+    assert result.exit_code == 0
+    assert "expired carts" in result.output
+
+
+def test_legacy_cart_gets_quantities(app):
+    # Before quantities were tracked the items mapped dish ids to prices.
+    with app.app_context():
+        app.extensions["cart_store"].save(
+            "legacy", {"items": {"1": 250, "2": 400}, "total": 650}
+        )
+    with app.test_request_context(headers={"Cookie": f"{CART_COOKIE}=legacy"}):
+        cart = get_or_create_cart()
+    assert cart == {"items": {"1": 1, "2": 1}, "count": 2, "total": 650}
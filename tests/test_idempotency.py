@@ -0,0 +1,76 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from food_delivery.idempotency import REPLAYED_HEADER, request_fingerprint, run_once
+from food_delivery.models import db, Category, IdempotencyKey, User
+
+ORDER = {"name": "user", "phone": "9261234567", "address": "ул. Ленина 1"}
+
+
+@pytest.fixture
+def shopper(client, login):
+    login(client)
+    return client
+
+
+def checkout(client, key, **fields):
+    client.put("/api/v1/cart/items/1/", json={"qty": 2})
+    return client.post(
+        "/api/v1/orders/", json=dict(ORDER, **fields), headers={"Idempotency-Key": key}
+    )
+
+
+def test_retry_replays_the_stored_order(shopper):
+    first = checkout(shopper, "retry")
+    assert first.status_code == 201
+
+    retry = shopper.post(
+        "/api/v1/orders/", json=ORDER, headers={"Idempotency-Key": "retry"}
+    )
+    assert retry.status_code == 201
+    assert retry.headers[REPLAYED_HEADER] == "true"
+    assert retry.get_json() == first.get_json()
+
+
+def test_reused_key_with_other_data_is_rejected(shopper):
+    assert checkout(shopper, "reused").status_code == 201
+    response = checkout(shopper, "reused", address="ул. Мира 2")
+    assert response.status_code == 422
+
+
+def test_reused_key_with_another_cart_is_rejected(shopper):
+    assert checkout(shopper, "other-cart").status_code == 201
+    shopper.put("/api/v1/cart/items/2/", json={"qty": 1})
+    assert checkout(shopper, "other-cart").status_code == 422
+
+
+def test_concurrent_commit_with_the_same_key_is_replayed(app):
+    with app.test_request_context("/api/v1/orders/", method="POST", json=ORDER):
+        user_id = User.query.filter_by(email="user@example.com").one().id
+        # Another worker finished the same request between our lookup and commit.
+        db.session.add(
+            IdempotencyKey(
+                user_id=user_id,
+                key="race",
+                fingerprint=request_fingerprint(),
+                status_code=201,
+                headers=json.dumps({"Content-Type": "application/json"}),
+                body=b'{"id": 1}',
+                created_at=datetime.utcnow(),
+            )
+        )
+        db.session.commit()
+
+        def action():
+            db.session.add(Category(title="written by the losing request"))
+            return app.response_class(b'{"id": 2}', 201)
+
+        response = run_once(user_id, "race", action)
+
+        assert response.get_data() == b'{"id": 1}'
+        assert response.headers[REPLAYED_HEADER] == "true"
+        assert (
+            Category.query.filter_by(title="written by the losing request").count() == 0
+        )
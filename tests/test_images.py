@@ -0,0 +1,44 @@
+import json
+import os
+
+from food_delivery.images import MANIFEST, PictureManifest
+
+ENTRY = {"variants": {"jpeg": [[300, "soup-300.jpg"]]}}
+
+
+def write_manifest(directory, entries, mtime):
+    path = directory / MANIFEST
+    path.write_text(json.dumps(entries))
+    os.utime(path, (mtime, mtime))
+
+
+def test_manifest_reloads_when_the_file_changes(tmp_path):
+    manifest = PictureManifest(tmp_path)
+    assert manifest.get("soup.jpg") is None
+    assert manifest.digest == ""
+
+    write_manifest(tmp_path, {"soup.jpg": ENTRY}, 1000)
+    assert manifest.get("soup.jpg") == ENTRY
+    digest = manifest.digest
+
+    write_manifest(tmp_path, {}, 2000)
+    assert manifest.get("soup.jpg") is None
+    assert manifest.digest not in ("", digest)
+
+
+def test_manifest_is_checked_once_an_interval(tmp_path, monkeypatch):
+    write_manifest(tmp_path, {"soup.jpg": ENTRY}, 1000)
+    manifest = PictureManifest(tmp_path, check_interval=60)
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda path: stats.append(path) or real_stat(path))
+
+    for _ in range(10):
+        assert manifest.get("soup.jpg") == ENTRY
+    assert len(stats) == 1
+
+    write_manifest(tmp_path, {}, 2000)
+    assert manifest.get("soup.jpg") == ENTRY
+
+    manifest.checked_at -= 60
+    assert manifest.get("soup.jpg") is None
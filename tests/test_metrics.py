@@ -0,0 +1,25 @@
+import pytest
+
+
+@pytest.fixture
+def metrics_client(make_app):
+    return make_app(METRICS_TOKEN="scrape").test_client()
+
+
+def test_metrics_are_hidden_without_a_token(client):
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_need_the_token(metrics_client):
+    assert metrics_client.get("/metrics").status_code == 401
+    response = metrics_client.get("/metrics", headers={"Authorization": "Bearer nope"})
+    assert response.status_code == 401
+
+
+def test_metrics_with_the_token(metrics_client):
+    metrics_client.get("/")
+    response = metrics_client.get(
+        "/metrics", headers={"Authorization": "Bearer scrape"}
+    )
+    assert response.status_code == 200
+    assert "http_request_duration_seconds_bucket" in response.get_data(as_text=True)
@@ -0,0 +1,49 @@
+import pytest
+from flask_migrate import Migrate, downgrade, upgrade
+
+from food_delivery.models import db
+
+ORDER_LINES = "5b0e2c7a91d4"
+
+
+@pytest.fixture
+def migrated(make_app, migrations_dir, tmp_path):
+    """ An empty database migrated up to the order lines revision. """
+    app = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'migrations.db'}")
+    Migrate(app, db, directory=migrations_dir)
+    with app.app_context():
+        upgrade(directory=migrations_dir, revision=ORDER_LINES)
+        yield db.engine
+
+
+def test_order_lines_downgrade_keeps_quantities(migrated, migrations_dir):
+    with migrated.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, name, email, password_hash, is_admin) "
+            "VALUES (1, 'a', 'a', 'x', 0)"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO dishes (id, title, price) VALUES (1, 'Суп', 100), (2, 'Чай', 50)"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO orders (id, user_id, total, phone, address, status, date) "
+            "VALUES (1, 1, 350, '1', 'a', 'New', '2021-01-01')"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO order_lines (order_id, dish_id, qty, unit_price, title) "
+            "VALUES (1, 1, 3, 100, 'Суп'), (1, 2, 1, 50, 'Чай')"
+        )
+
+    downgrade(directory=migrations_dir, revision=f"{ORDER_LINES}-1")
+    with migrated.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT dish_id, COUNT(*) FROM orders_dishes GROUP BY dish_id ORDER BY dish_id"
+        ).fetchall()
+    assert [tuple(row) for row in rows] == [(1, 3), (2, 1)]
+
+    upgrade(directory=migrations_dir, revision=ORDER_LINES)
+    with migrated.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT dish_id, qty FROM order_lines ORDER BY dish_id"
+        ).fetchall()
+    assert [tuple(row) for row in rows] == [(1, 3), (2, 1)]
@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from food_delivery.passwords import PasswordHasher, PasswordHashingBusy
+
+
+@pytest.fixture
+def blocked():
+    """ Start a hash that runs until the test releases it. """
+    release = threading.Event()
+    threads = []
+
+    def start(hasher):
+        started = threading.Event()
+
+        def slow_hash():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=hasher._run, args=(slow_hash,))
+        thread.start()
+        threads.append(thread)
+        started.wait(5)
+
+    yield start
+    release.set()
+    for thread in threads:
+        thread.join()
+
+
+def test_hashes_run_on_the_calling_thread():
+    hasher = PasswordHasher("pbkdf2:sha256:1000", 1, 0, 1)
+    assert hasher._run(threading.current_thread) is threading.current_thread()
+    assert hasher.verify(hasher.hash("secret"), "secret")
+
+
+def test_full_queue_is_rejected_at_once(blocked):
+    hasher = PasswordHasher("pbkdf2:sha256:1000", 1, 0, 30)
+    blocked(hasher)
+    with pytest.raises(PasswordHashingBusy) as error:
+        hasher.hash("secret")
+    assert error.value.retry_after == 30
+
+
+def test_queued_hash_gives_up_after_the_timeout(blocked):
+    hasher = PasswordHasher("pbkdf2:sha256:1000", 1, 1, 0.05)
+    blocked(hasher)
+    with pytest.raises(PasswordHashingBusy) as error:
+        hasher.hash("secret")
+    assert error.value.retry_after == 1
+
+
+def test_api_reports_busy_hashing_as_503(app, client, monkeypatch):
+    def busy(*args):
+        raise PasswordHashingBusy("busy", 5)
+
+    monkeypatch.setattr(app.extensions["password_hasher"], "_run", busy)
+    response = client.post(
+        "/api/v1/login/", json={"email": "user@example.com", "password": "secret"}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert response.get_json() == {"error": "The server is busy, try again later"}
+
+
+def test_bench_hash_command(app):
+    result = app.test_cli_runner().invoke(
+        args=["bench-hash", "--rounds", "2", "--iterations", "1000"]
+    )
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith("pbkdf2:sha256:1000: p50")
@@ -0,0 +1,46 @@
+import pytest
+
+from food_delivery.profiling import QueryBudgetExceeded
+
+BUDGET = 8
+
+
+@pytest.fixture
+def strict_client(make_app):
+    app = make_app(
+        SQLALCHEMY_QUERY_BUDGET=BUDGET,
+        SQLALCHEMY_QUERY_BUDGET_STRICT=True,
+        PROPAGATE_EXCEPTIONS=True,
+    )
+    return app.test_client()
+
+
+def test_pages_stay_within_query_budget(client, strict_client, login):
+    # Checkout is not a budgeted page; place the order outside the strict app.
+    login(client)
+    client.post("/", data={"dish_id": "1"})
+    response = client.post(
+        "/cart/",
+        data={"name": "user", "address": "ул. Ленина 1", "phone": "9261234567"},
+    )
+    assert response.status_code == 302
+
+    login(strict_client)
+    strict_client.post("/", data={"dish_id": "2"})
+
+    for path in ("/", "/cart/", "/account/", "/api/v1/catalog/"):
+        response = strict_client.get(path)
+        assert response.status_code == 200, path
+        assert int(response.headers["X-Query-Count"]) <= BUDGET, path
+
+
+def test_strict_budget_raises(make_app, login):
+    app = make_app(
+        SQLALCHEMY_QUERY_BUDGET=1,
+        SQLALCHEMY_QUERY_BUDGET_STRICT=True,
+        PROPAGATE_EXCEPTIONS=True,
+    )
+    client = app.test_client()
+    login(client)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/account/")
@@ -0,0 +1,16 @@
+from food_delivery.models import db
+from food_delivery.query_plans import FULL_SCAN, explain, full_scans, plan_checks
+
+
+def test_main_queries_use_indexes(app):
+    with app.app_context(), db.engine.connect() as conn:
+        full_scan = FULL_SCAN[conn.dialect.name]
+        for name, query, indexed_tables in plan_checks():
+            plan = explain(conn, query)
+            assert not full_scans(full_scan, plan, indexed_tables), (name, plan)
+
+
+def test_full_scans_ignores_index_scans():
+    plan = ["SCAN orders", "SCAN order_lines USING INDEX ix_order_lines_dish_id"]
+    tables = ["orders", "order_lines"]
+    assert full_scans(FULL_SCAN["sqlite"], plan, tables) == ["orders"]
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from food_delivery.ratelimit import Limit, RedisRateLimiter, parse_limit, take
+
+LIMIT = Limit(capacity=3, rate=0.5)
+
+
+def test_parse_limit():
+    assert parse_limit("10/minute") == Limit(capacity=10, rate=10 / 60)
+    assert parse_limit("60/minute burst 20") == Limit(capacity=20, rate=1)
+
+
+def test_take_starts_full_and_empties():
+    state, now = None, 100.0
+    for tokens_left in (2, 1, 0):
+        state, retry_after = take(state, now, LIMIT)
+        assert state == (tokens_left, now)
+        assert retry_after == 0
+
+    state, retry_after = take(state, now, LIMIT)
+    assert state == (0, now)
+    assert retry_after == 2
+
+
+def test_take_refills_at_the_rate_up_to_capacity():
+    state, retry_after = take((0, 100.0), 101.0, LIMIT)
+    assert state == (0.5, 101.0)
+    assert retry_after == 1
+
+    state, retry_after = take((0, 100.0), 103.0, LIMIT)
+    assert state == (0.5, 103.0)
+    assert retry_after == 0
+
+    state, retry_after = take((0, 100.0), 1000.0, LIMIT)
+    assert state == (2, 1000.0)
+
+
+def test_redis_rate_limiter_shares_buckets(fake_redis, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    # Workers each hold their own limiter over the same Redis.
+    first, second = RedisRateLimiter(fake_redis), RedisRateLimiter(fake_redis)
+
+    assert first.hit("login:ip:1", LIMIT) == 0
+    assert second.hit("login:ip:1", LIMIT) == 0
+    assert first.hit("login:ip:1", LIMIT) == 0
+    assert second.hit("login:ip:1", LIMIT) == 2
+    assert first.hit("login:ip:2", LIMIT) == 0
+    assert fake_redis.ttl("ratelimit:login:ip:1") == 6
+
+    now[0] += 2
+    assert second.hit("login:ip:1", LIMIT) == 0
+
+
+@pytest.fixture
+def limited_app(make_app):
+    def limited_app(hops):
+        return make_app(
+            RATE_LIMIT_ENABLED=True,
+            RATE_LIMITS="main.login_view=1/minute",
+            TRUSTED_PROXY_HOPS=hops,
+        )
+
+    return limited_app
+
+
+def login_from(client, address):
+    return client.post(
+        "/login/", data={}, headers={"X-Forwarded-For": address}
+    ).status_code
+
+
+def test_trusted_proxy_hop_limits_each_client(limited_app):
+    client = limited_app(1).test_client()
+    assert login_from(client, "203.0.113.1") != 429
+    assert login_from(client, "203.0.113.1") == 429
+    assert login_from(client, "203.0.113.2") != 429
+    # Only the last hop is trusted; addresses the client prepends are ignored.
+    assert login_from(client, "203.0.113.9, 203.0.113.2") == 429
+
+
+def test_forwarded_for_is_ignored_without_trusted_hops(limited_app):
+    client = limited_app(0).test_client()
+    assert login_from(client, "203.0.113.1") != 429
+    assert login_from(client, "203.0.113.2") == 429
@@ -0,0 +1,8 @@
+def test_search_box_keeps_the_query(client):
+    body = client.get("/search/?q=суп").get_data(as_text=True)
+    assert 'value="суп"' in body
+
+
+def test_search_box_is_empty_elsewhere(client):
+    body = client.get("/?q=суп").get_data(as_text=True)
+    assert 'value="суп"' not in body